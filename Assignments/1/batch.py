@@ -0,0 +1,136 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import cv2
+
+from final import run_pipeline, draw_glass_labels, build_container_index
+from thresholds import ThresholdProvider
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Per-worker threshold cache and container index for fixed-camera batches, set up by init_worker
+threshold_provider = None
+container_index = None
+
+CSV_FIELDS = ['image', 'glass', 'x', 'y', 'w', 'h', 'liquid_height', 'container', 'container_height', 'glass_height',
+              'fill_percentage', 'label', 'error']
+
+
+# Expand directories and glob patterns into a sorted list of image paths
+def collect_images(inputs):
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(os.path.join(item, name) for name in os.listdir(item)
+                         if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.update(glob.glob(item))
+    return sorted(paths)
+
+
+# Save every pipeline stage and the labeled image to the debug directory
+def save_debug_images(debug_dir, image_path, image, stages):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    for stage in ('grayscale', 'sharpened', 'blurred', 'liquid_mask', 'refined_mask'):
+        cv2.imwrite(os.path.join(debug_dir, f"{stem}_{stage}.png"), stages[stage])
+    labeled = draw_glass_labels(image.copy(), stages['glasses'])
+    cv2.imwrite(os.path.join(debug_dir, f"{stem}_labeled.png"), labeled)
+
+
+# Worker initializer: give each process its own threshold cache, and index the containers
+# of the reference image once so every image of a fixed camera reuses them
+def init_worker(threshold_tolerance, threshold_ema, container_reference=None):
+    global threshold_provider, container_index
+    if threshold_tolerance is not None:
+        threshold_provider = ThresholdProvider(threshold_tolerance, threshold_ema)
+    if container_reference is not None:
+        container_index = build_container_index(cv2.imread(container_reference))
+
+
+# Worker: run the fill-level pipeline on one image and return its result record
+def inspect_image(image_path, debug_dir=None):
+    start = time.perf_counter()
+    image = cv2.imread(image_path)
+    if image is None:
+        return {'image': image_path, 'error': 'Unable to load image'}
+
+    try:
+        stages = run_pipeline(image, threshold_provider=threshold_provider, container_index=container_index)
+        if debug_dir is not None:
+            save_debug_images(debug_dir, image_path, image, stages)
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'error': f"{type(exc).__name__}: {exc}"}
+
+    return {
+        'image': image_path,
+        'glass_height': stages['glass_height'],
+        'glasses': stages['glasses'],
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+# Write one CSV row per glass, or one JSON line per image for any other extension
+def write_results(results, results_path):
+    with open(results_path, 'w', newline='') as results_file:
+        if not results_path.lower().endswith('.csv'):
+            for result in results:
+                results_file.write(json.dumps(result) + '\n')
+            return
+
+        writer = csv.DictWriter(results_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for result in results:
+            if 'error' in result:
+                writer.writerow({'image': result['image'], 'error': result['error']})
+                continue
+            for index, glass in enumerate(result['glasses']):
+                writer.writerow(dict(glass, image=result['image'], glass=index, glass_height=result['glass_height']))
+
+
+# Run the pipeline over every image in a worker pool and write the structured results.
+# With a threshold tolerance (fixed camera), each worker reuses multi-Otsu thresholds
+# while the image histograms stay within it. With a container reference image, every
+# liquid is measured against the containers found in that image.
+def run_batch(inputs, results_path, workers=None, debug_dir=None, threshold_tolerance=None, threshold_ema=None,
+              container_reference=None):
+    image_paths = collect_images(inputs)
+    if debug_dir is not None:
+        os.makedirs(debug_dir, exist_ok=True)
+    if container_reference is not None and cv2.imread(container_reference) is None:
+        raise ValueError(f"Unable to load container reference image {container_reference}")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(threshold_tolerance, threshold_ema, container_reference)) as executor:
+        results = list(executor.map(inspect_image, image_paths, repeat(debug_dir), chunksize=4))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path)
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch liquid fill inspection for glasses and bottles.')
+    parser.add_argument('inputs', nargs='+', help='image directories, files or glob patterns')
+    parser.add_argument('--results', default='results.csv', help='results file (.csv per glass, else JSON Lines)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--debug-dir', default=None, help='optionally save every pipeline stage here')
+    parser.add_argument('--threshold-tolerance', type=float, default=None,
+                        help='fixed camera: reuse thresholds while the histogram distance stays below this (0-1)')
+    parser.add_argument('--threshold-ema', type=float, default=None,
+                        help='fixed camera: smooth histograms with this moving-average weight (0-1)')
+    parser.add_argument('--container-reference', default=None,
+                        help='fixed camera: find the containers once in this image and reuse them for every image')
+    args = parser.parse_args()
+
+    results, elapsed = run_batch(args.inputs, args.results, args.workers, args.debug_dir,
+                                 args.threshold_tolerance, args.threshold_ema, args.container_reference)
+    glasses = sum(len(result.get('glasses', [])) for result in results)
+    errors = sum('error' in result for result in results)
+    print(f"Inspected {len(results)} images ({glasses} glasses, {errors} errors) in {elapsed:.2f}s")
@@ -0,0 +1,84 @@
+import argparse
+import glob
+import timeit
+
+import cv2
+import numpy as np
+from skimage.filters import threshold_multiotsu
+
+from final import ImageAnalysis, apply_multi_otsu_threshold, get_avg_glass_height
+from thresholds import image_histogram, fast_multiotsu_thresholds, ThresholdProvider
+
+
+# Original thresholding: threshold_multiotsu on each image and int64 np.where masks
+def thresholds_before(image):
+    grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    sharpened = cv2.filter2D(grayscale, -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+    blurred = cv2.GaussianBlur(sharpened, (3, 3), 0)
+
+    t1, t2 = threshold_multiotsu(blurred, classes=3)
+    liquid_mask = ((np.where(blurred > t1, 1, 0) - np.where(blurred > t2, 1, 0)) * 255).astype(np.uint8)
+
+    g1, g2 = threshold_multiotsu(grayscale, classes=3)
+    glass_mask = (np.where(grayscale > g1, 1, 0) * 255).astype(np.uint8)
+    return liquid_mask, glass_mask
+
+
+# Shared analysis context: one histogram per image and uint8 masks
+def thresholds_after(image):
+    analysis = ImageAnalysis(image)
+    liquid_mask = apply_multi_otsu_threshold(analysis.blurred, analysis.blurred_thresholds)
+    glass_mask = cv2.threshold(analysis.grayscale, int(analysis.grayscale_thresholds[0]), 255, cv2.THRESH_BINARY)[1]
+    return liquid_mask, glass_mask
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark multi-Otsu thresholding before and after sharing it.')
+    parser.add_argument('pattern', nargs='?', default='*.png')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=5)
+    args = parser.parse_args()
+
+    images = [(path, cv2.imread(path)) for path in sorted(glob.glob(args.pattern))]
+    images = [(path, image) for path, image in images if image is not None]
+
+    print("Shared analysis context vs. threshold_multiotsu per stage")
+    for path, image in images:
+        # The masks and the glass height must not change
+        before, after = thresholds_before(image), thresholds_after(image)
+        same = all(np.array_equal(b, a) for b, a in zip(before, after))
+        analysis = ImageAnalysis(image)
+        same = same and get_avg_glass_height(analysis.grayscale, False) == \
+            get_avg_glass_height(analysis.grayscale, False, analysis.grayscale_thresholds)
+
+        t_before = min(timeit.repeat(lambda: thresholds_before(image), number=args.number, repeat=args.repeat))
+        t_after = min(timeit.repeat(lambda: thresholds_after(image), number=args.number, repeat=args.repeat))
+        t_before, t_after = t_before / args.number * 1000, t_after / args.number * 1000
+        print(f"{path:28s} {image.shape[1]}x{image.shape[0]:<5d} before {t_before:7.2f} ms  "
+              f"after {t_after:7.2f} ms  speedup {t_before / t_after:5.2f}x  identical {same}")
+
+    print("\nVectorized multi-Otsu from the histogram vs. threshold_multiotsu(image)")
+    for path, image in images:
+        analysis = ImageAnalysis(image)
+        same = True
+        for gray in (analysis.grayscale, analysis.blurred):
+            same = same and np.array_equal(fast_multiotsu_thresholds(image_histogram(gray)),
+                                           threshold_multiotsu(gray, classes=3))
+        gray = analysis.grayscale
+        t_skimage = min(timeit.repeat(lambda: threshold_multiotsu(gray, classes=3),
+                                      number=args.number, repeat=args.repeat))
+        t_fast = min(timeit.repeat(lambda: fast_multiotsu_thresholds(image_histogram(gray)),
+                                   number=args.number, repeat=args.repeat))
+        t_skimage, t_fast = t_skimage / args.number * 1000, t_fast / args.number * 1000
+        print(f"{path:28s} skimage {t_skimage:7.2f} ms  histogram {t_fast:7.2f} ms  "
+              f"speedup {t_skimage / t_fast:5.2f}x  identical {same}")
+
+    # A fixed camera: slightly noisy copies of one frame reuse the cached thresholds
+    if images:
+        path, image = images[0]
+        rng = np.random.default_rng(0)
+        provider = ThresholdProvider(tolerance=0.05)
+        frames = [cv2.add(image, rng.integers(0, 3, image.shape, dtype=np.uint8)) for _ in range(20)]
+        agree = all(np.array_equal(ImageAnalysis(frame, provider).grayscale_thresholds,
+                                   ImageAnalysis(frame).grayscale_thresholds) for frame in frames)
+        print(f"\nThresholdProvider on 20 noisy frames of {path}: {provider.stats}, identical {agree}")
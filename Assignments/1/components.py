@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+# One row per glass, filled in with whole-array operations on the component stats
+GLASS_DTYPE = np.dtype([
+    ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32), ('area', np.int32),
+    ('liquid_top', np.int32), ('liquid_bottom', np.int32), ('liquid_height', np.int32),
+    ('container', np.int32), ('container_height', np.float64), ('fill_percentage', np.float64),
+])
+
+
+# Fill the holes of a binary mask: background regions that do not touch the image border.
+# The background is labeled with 4-connectivity, the complement of the 8-connected foreground.
+def fill_holes(mask):
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(cv2.bitwise_not(mask), connectivity=4)
+    height, width = mask.shape
+    x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+    touches_border = (x == 0) | (y == 0) | (x + w == width) | (y + h == height)
+
+    # Map every background label to 255 if it is a hole, in a single gather
+    hole_lut = np.where(touches_border, 0, 255).astype(np.uint8)
+    return cv2.bitwise_or(mask, hole_lut[labels])
+
+
+# Lower and upper bounds of the area cv2.contourArea gives the outer contour findContours
+# would return for every component, without tracing it. The contour is a polygon through
+# the centers of the boundary pixels; when it is simple, Pick's theorem makes its area the
+# pixels minus half the boundary pixels minus one. Spurs, one pixel wide lines and diagonal
+# pinches are traced twice and enclose less (a line of n pixels has area 0), so that is an
+# upper bound. The polygon still encloses the centers of all the other pixels, which makes
+# the pixels minus the boundary pixels minus one a lower bound.
+def contour_area_bounds(labels, filled, stats):
+    cross = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+    boundary = cv2.subtract(filled, cv2.erode(filled, cross, borderType=cv2.BORDER_CONSTANT, borderValue=0))
+    boundary_pixels = np.bincount(labels[boundary > 0], minlength=len(stats))
+    pixels = stats[:, cv2.CC_STAT_AREA]
+    return np.maximum(pixels - boundary_pixels - 1, 0), np.maximum(pixels - boundary_pixels / 2 - 1, 0)
+
+
+# Exact contour area of one labeled component, traced in its bounding box
+def traced_contour_area(labels, stats, label):
+    x, y, w, h = stats[label, :4]
+    component = cv2.copyMakeBorder((labels[y:y + h, x:x + w] == label).view(np.uint8), 1, 1, 1, 1,
+                                   cv2.BORDER_CONSTANT, value=0)
+    contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return cv2.contourArea(contours[0])
+
+
+# Indices of the components whose contour area is at least min_area. The bounds decide for
+# almost all of them; only those between the bounds are traced, with trace(index).
+def select_by_contour_area(low, high, min_area, trace):
+    keep = low >= min_area
+    for index in np.flatnonzero(~keep & (high >= min_area)):
+        keep[index] = trace(index) >= min_area
+    return np.flatnonzero(keep)
+
+
+# Label the external components of a mask, the same regions findContours(RETR_EXTERNAL)
+# outlines, and keep those whose contour area (holes included) is at least min_area.
+# Returns the label image, the kept labels and their stats rows (x, y, w, h, area).
+def external_components(mask, min_area=1000):
+    filled = fill_holes(mask)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8)
+    low, high = contour_area_bounds(labels, filled, stats)
+    # Label 0 is the background
+    keep = 1 + select_by_contour_area(low[1:], high[1:], min_area,
+                                      lambda index: traced_contour_area(labels, stats, index + 1))
+    return labels, keep, stats[keep]
+
+
+# Heights of every glass/bottle component of the glass mask
+def component_heights(glass_mask, min_area=1000):
+    _, _, stats = external_components(glass_mask, min_area)
+    return stats[:, cv2.CC_STAT_HEIGHT]
+
+
+# Build the GLASS_DTYPE record array of liquid components from their stats rows (x, y, w, h, area).
+# A component spans every row of its own bounding box, so its top and bottom liquid rows
+# are the box edges; this is what the per-contour np.any(axis=1) row scan found.
+# With a ContainerIndex each liquid is measured against its own container's height;
+# liquids outside every container (or without an index) fall back to glass_height.
+def glass_table(stats, glass_height, container_index=None):
+    table = np.zeros(len(stats), dtype=GLASS_DTYPE)
+    table['x'] = stats[:, cv2.CC_STAT_LEFT]
+    table['y'] = stats[:, cv2.CC_STAT_TOP]
+    table['w'] = stats[:, cv2.CC_STAT_WIDTH]
+    table['h'] = stats[:, cv2.CC_STAT_HEIGHT]
+    table['area'] = stats[:, cv2.CC_STAT_AREA]
+    table['liquid_top'] = table['y']
+    table['liquid_bottom'] = table['y'] + table['h']  # One past the last row, like the row scan
+    table['liquid_height'] = table['liquid_bottom'] - table['liquid_top']
+    if container_index is None:
+        table['container'] = -1
+        table['container_height'] = glass_height
+    else:
+        boxes = stats[:, :4]
+        table['container'], table['container_height'] = container_index.container_heights(boxes, glass_height)
+    table['fill_percentage'] = table['liquid_height'] / table['container_height'] * 100
+    return table
+
+
+# Measure every glass of the liquid mask at once and return a GLASS_DTYPE record array
+def measure_glass_components(liquid_mask, glass_height, min_area=1000, container_index=None):
+    _, _, stats = external_components(liquid_mask, min_area)
+    return glass_table(stats, glass_height, container_index)
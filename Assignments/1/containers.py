@@ -0,0 +1,71 @@
+import numpy as np
+
+from components import external_components
+
+
+# Spatial index of the containers (glasses/bottles) of a glass mask, used to measure every
+# liquid against the height of its own container instead of the average glass height.
+# Container boxes are bucketed in a uniform grid, so matching a liquid only compares it
+# with the containers sharing its grid cells. With a fixed camera the containers do not
+# move, so one index can be built from a reference frame and reused for every frame.
+class ContainerIndex:
+    def __init__(self, boxes, cell_size=64, base_margin=10):
+        # boxes: (N, 4) array of container x, y, w, h
+        self.boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        self.cell_size = cell_size
+        # Pixels of the box that cannot hold liquid (rim and base), like the old global buffer
+        self.heights = np.maximum(self.boxes[:, 3] - base_margin, 1)
+
+        # Register every container in each grid cell its box covers
+        self.cells = {}
+        for index, (x0, y0, x1, y1) in enumerate(self._cell_ranges(self.boxes)):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(index)
+
+    # Build the index from the container components of a binary glass mask
+    @classmethod
+    def from_mask(cls, glass_mask, min_area=1000, cell_size=64, base_margin=10):
+        _, _, stats = external_components(glass_mask, min_area)
+        return cls(stats[:, :4], cell_size, base_margin)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    # Average container height, 0 without containers (what get_avg_glass_height returns)
+    def average_height(self):
+        return float(np.mean(self.boxes[:, 3])) if len(self.boxes) else 0
+
+    # First and last grid cell column/row covered by each box
+    def _cell_ranges(self, boxes):
+        x, y, w, h = boxes.T
+        return np.stack([x, y, x + w - 1, y + h - 1], axis=1) // self.cell_size
+
+    # Index of the container overlapping each box the most, or -1 when none overlaps it
+    def match(self, boxes):
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        matches = np.full(len(boxes), -1)
+        for i, (x0, y0, x1, y1) in enumerate(self._cell_ranges(boxes)):
+            candidates = {index for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)
+                          for index in self.cells.get((cx, cy), ())}
+            if not candidates:
+                continue
+
+            # Intersection area of the box with every candidate container at once
+            candidates = np.fromiter(candidates, dtype=np.int64)
+            x, y, w, h = boxes[i]
+            cx, cy, cw, ch = self.boxes[candidates].T
+            overlap_w = np.minimum(x + w, cx + cw) - np.maximum(x, cx)
+            overlap_h = np.minimum(y + h, cy + ch) - np.maximum(y, cy)
+            overlap = np.clip(overlap_w, 0, None) * np.clip(overlap_h, 0, None)
+            if overlap.max() > 0:
+                matches[i] = candidates[np.argmax(overlap)]
+        return matches
+
+    # Calibrated height of the container of each box; boxes without one get `default`
+    def container_heights(self, boxes, default):
+        matches = self.match(boxes)
+        heights = np.full(len(matches), default, dtype=np.float64)
+        heights[matches >= 0] = self.heights[matches[matches >= 0]]
+        return matches, heights
+
@@ -1,7 +1,8 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
-from skimage.filters import threshold_multiotsu
+from thresholds import image_histogram, multiotsu_thresholds, mask_above, mask_between
+from containers import ContainerIndex
 
 # Step 1: Load the image (replace 'main4.png' with your actual image)
 image = cv2.imread('main5.png')
@@ -9,41 +10,29 @@ image = cv2.imread('main5.png')
 # Convert to grayscale
 gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-# Step 2: Apply multi-level Otsu thresholding to get two threshold values
-thresholds = threshold_multiotsu(gray_image, classes=3)
+# Step 2: Apply multi-level Otsu thresholding to get two threshold values from one histogram
+thresholds = multiotsu_thresholds(image_histogram(gray_image), classes=3)
 t1, t2 = thresholds
 
-# Step 3: Binary thresholding for bottle and liquid detection
-bL = np.where(gray_image > t1, 1, 0)  # Lower threshold for bottles
-bH = np.where(gray_image > t2, 1, 0)  # Higher threshold for liquid
-liquid_mask = bL - bH  # Liquid region
-liquid_mask = (liquid_mask * 255).astype(np.uint8)  # Convert to binary mask
+# Step 3: Binary thresholding for liquid detection (above the lower threshold, not above the higher one)
+liquid_mask = mask_between(gray_image, t1, t2)  # Liquid region as a uint8 binary mask
 
-# Step 4: Create bottle mask
-bottel_mask = np.where(gray_image > t1, 1, 0)
-bottel_mask = (bottel_mask * 255).astype(np.uint8)
+# Step 4: Create bottle mask (above the lower threshold)
+bottel_mask = mask_above(gray_image, t1)
 
 # Step 5: Morphological closing to reduce noise in the liquid region
 kernel = np.ones((5, 5), np.uint8)
 liquid_clean = cv2.morphologyEx(liquid_mask, cv2.MORPH_CLOSE, kernel)  # Clean the liquid mask
 refined_mask = cv2.erode(liquid_clean, kernel, iterations=2)
 
-# Step 6: Find contours for all bottles in the bottle mask
-contours, _ = cv2.findContours(bottel_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+# Step 6: Index all bottles in the bottle mask, ignoring small contours (e.g., noise)
+containers = ContainerIndex.from_mask(bottel_mask, min_area=1000)
 
-# Initialize counters for total bottles and bottles with liquid
-total_bottles = 0
+# Step 7: Count total bottles and initialize the count of bottles with liquid
+total_bottles = len(containers)
+average_bottle_height = containers.average_height()  # 0 without bottles
 bottles_with_liquid = 0
 
-# Step 7: Loop over bottle contours to count total bottles
-for contour in contours:
-    # Calculate contour area and filter out small contours (e.g., noise)
-    area = cv2.contourArea(contour)
-    if area < 1000:
-        continue
-    # Increment total bottle count
-    total_bottles += 1
-
 # Step 8: Find contours for liquid-filled regions using the refined mask
 contours_liquid, _ = cv2.findContours(refined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -69,8 +58,12 @@ for contour in contours_liquid:
         lowest_liquid_level = len(non_zero_rows) - np.argmax(non_zero_rows[::-1])  # Last row with liquid
         liquid_height = lowest_liquid_level - highest_liquid_level
 
-        # Calculate the percentage of the bottle filled with liquid
-        fill_percentage = (liquid_height / 520) * 100
+        # Calculate the percentage of the bottle filled with liquid, against the height of the
+        # bottle containing it (the average bottle height if the liquid lies outside every
+        # bottle, and the liquid's own height if no bottle was found at all)
+        _, (bottle_height,) = containers.container_heights([(x, y, w, h)],
+                                                            default=average_bottle_height or liquid_height)
+        fill_percentage = (liquid_height / bottle_height) * 100
 
         # Increment count for bottles with liquid
         bottles_with_liquid += 1
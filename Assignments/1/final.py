@@ -1,7 +1,9 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
-from skimage.filters import threshold_multiotsu
+from thresholds import image_histogram, multiotsu_thresholds, mask_above, mask_between
+from components import measure_glass_components, component_heights
+from containers import ContainerIndex
 
 # Convert the input image to grayscale
 def convert_to_grayscale(image):
@@ -26,18 +28,14 @@ def sharpen_image(image):
     return cv2.filter2D(image, -1, sharpening_kernel)
 
 # Apply multi-level Otsu thresholding to segment the image into three classes
-def apply_multi_otsu_threshold(image):
-    # Get the thresholds using multi-Otsu for three classes
-    thresholds = threshold_multiotsu(image, classes=3)
+def apply_multi_otsu_threshold(image, thresholds=None):
+    # Get the thresholds using multi-Otsu for three classes, unless already computed
+    if thresholds is None:
+        thresholds = multiotsu_thresholds(image_histogram(image), classes=3)
     t1, t2 = thresholds  # Two thresholds for separating three regions
 
-    # Create binary masks based on the thresholds
-    bL = np.where(image > t1, 1, 0)  # Lower threshold for the lighter region (liquid)
-    bH = np.where(image > t2, 1, 0)  # Higher threshold for darker regions
-
-    # Subtract the high and low regions to isolate the middle region (liquid)
-    liquid_mask = bL - bH
-    return (liquid_mask * 255).astype(np.uint8)  # Return as binary mask
+    # Keep the middle region (liquid): above the lower threshold but not above the higher one
+    return mask_between(image, t1, t2)  # Return as binary mask
 
 # Apply morphological closing to remove small gaps in the image
 def apply_morphology(image):
@@ -55,122 +53,159 @@ def refine_contours(mask):
     
     return refined_mask
 
+# Label a glass based on its fill percentage
+def fill_label(fill_percentage):
+    if fill_percentage >= 90:
+        return f"Fully Filled: {fill_percentage:.1f}%"
+    elif fill_percentage == 0:
+        return "Empty"
+    else:
+        return f"Partially Filled: {fill_percentage:.1f}%"
+
+# Convert a GLASS_DTYPE record array into one result dict per glass
+def glass_records(table):
+    return [{'x': int(glass['x']), 'y': int(glass['y']), 'w': int(glass['w']), 'h': int(glass['h']),
+             'liquid_height': int(glass['liquid_height']),
+             'container': int(glass['container']), 'container_height': float(glass['container_height']),
+             'fill_percentage': float(glass['fill_percentage']),
+             'label': fill_label(glass['fill_percentage'])}
+            for glass in table]
+
+# Measure the liquid height and fill percentage of every glass in the liquid mask.
+# All glasses are measured at once from the connected-component stats (see components.py),
+# so the cost does not grow with a Python loop over the contours. With a ContainerIndex
+# each liquid is measured against its own container, otherwise against glass_height.
+def measure_glasses(liquid_mask, glass_height, container_index=None):
+    table = measure_glass_components(liquid_mask, glass_height, min_area=1000, container_index=container_index)
+    return glass_records(table)
+
+# Draw the bounding box and label of every measured glass on the image
+def draw_glass_labels(image, glasses):
+    for glass in glasses:
+        x, y, w, h = glass['x'], glass['y'], glass['w'], glass['h']
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(image, f"{glass['label']}", (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return image
+
 # Detect and label glasses based on their liquid height percentage
 def detect_and_label_glasses(original_image, liquid_mask, glass_height):
-    # Find contours of liquid in the binary mask
-    contours, _ = cv2.findContours(liquid_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    glass_count = 0  # Initialize glass count
-
-    # Loop over each contour representing a glass
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        
-        # Ignore small contours that may be noise
-        if area < 1000:
-            continue
-
-        # Get bounding box of the detected glass contour
-        x, y, w, h = cv2.boundingRect(contour)
-
-        # Extract the region of interest within the bounding box
-        glass_region = liquid_mask[y:y+h, x:x + w]
-
-        # Find the highest and lowest points where liquid is detected
-        non_zero_rows = np.any(glass_region > 0, axis=1)
-        if np.any(non_zero_rows):
-            highest_liquid_level = np.argmax(non_zero_rows)  # First row with liquid
-            lowest_liquid_level = len(non_zero_rows) - np.argmax(non_zero_rows[::-1])  # Last row with liquid
-            liquid_height = lowest_liquid_level - highest_liquid_level  # Calculate height of the liquid
-        else:
-            liquid_height = 0  # If no liquid is detected
-
-        # Calculate the fill percentage based on liquid height relative to glass height
-        fill_percentage = (liquid_height / glass_height) * 100
+    glasses = measure_glasses(liquid_mask, glass_height)
 
-        # Label the glass based on fill percentage
-        if fill_percentage >= 90:
-            label = f"Fully Filled: {fill_percentage:.1f}%"
-        elif fill_percentage == 0:
-            label = "Empty"
-        else:
-            label = f"Partially Filled: {fill_percentage:.1f}%"
-
-        glass_count += 1  # Increment glass count
-
-        # Draw bounding box and label on the original image
-        cv2.rectangle(original_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(original_image, f"{label}", (x, y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    # Draw bounding boxes and labels on the original image
+    draw_glass_labels(original_image, glasses)
 
     # Display the final labeled image
     show_image(original_image)
 
     # Output the total number of glasses detected
-    print(f"Total liquid Detected glasses : {glass_count}")
+    print(f"Total liquid Detected glasses : {len(glasses)}")
 
 # Get the average height of the glass based on contours from thresholded image
-def get_avg_glass_height(grayscale_image):
-    # Apply multi-Otsu threshold to detect glass regions
-    thresholds = threshold_multiotsu(grayscale_image, classes=3)
+def get_avg_glass_height(grayscale_image, verbose=True, thresholds=None):
+    # Apply multi-Otsu threshold to detect glass regions, unless already computed
+    if thresholds is None:
+        thresholds = multiotsu_thresholds(image_histogram(grayscale_image), classes=3)
     t1, t2 = thresholds 
-    glass_mask = np.where(grayscale_image > t1, 1, 0) 
-    glass_mask = (glass_mask * 255).astype(np.uint8)
-
-    # Find contours of glasses in the image
-    glass_contours, _ = cv2.findContours(glass_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    total_height = 0  # Sum of glass heights
-    glass_count = 0  # Count of detected glasses
+    glass_mask = mask_above(grayscale_image, t1)
 
-    # Loop over each detected glass contour
-    for contour in glass_contours:
-        area = cv2.contourArea(contour)
-        if area < 1000:  # Filter out small, irrelevant contours
-            continue
-        x, y, w, glass_height = cv2.boundingRect(contour)
-        total_height += glass_height
-        glass_count += 1
+    # Heights of all glass components, ignoring small irrelevant ones
+    glass_heights = component_heights(glass_mask, min_area=1000)
+    glass_count = len(glass_heights)  # Count of detected glasses
 
     # Calculate the average height of the glasses
     if glass_count == 0:  # Handle case where no glass is detected
         return 0
     
-    avg_glass_height = total_height / glass_count
-    print(f"Total Glasses Detected: {glass_count}")
-    print(f"Average Glass Height: {avg_glass_height} pixels")
+    avg_glass_height = float(np.mean(glass_heights))
+    if verbose:
+        print(f"Total Glasses Detected: {glass_count}")
+        print(f"Average Glass Height: {avg_glass_height} pixels")
     return avg_glass_height
 
-# Main processing function to handle the image processing pipeline
-def process_image(image_path):
-    # Step 1: Load the image
-    image = cv2.imread(image_path)
+# Per-image analysis context: the filtered images, their histograms and their
+# multi-Otsu thresholds are each computed once and shared by the pipeline stages.
+# A ThresholdProvider can be passed to reuse thresholds across frames of a fixed camera.
+class ImageAnalysis:
+    def __init__(self, image, threshold_provider=None):
+        # Step 2: Convert the image to grayscale
+        self.grayscale = convert_to_grayscale(image)
+
+        # Step 3: Sharpen the grayscale image to enhance features
+        self.sharpened = sharpen_image(self.grayscale)
+
+        # Step 4: Apply Gaussian blur to smooth the image and reduce noise
+        self.blurred = cv2.GaussianBlur(self.sharpened, (3, 3), 0)
+
+        # One histogram per image; the liquid uses the blurred image, the glass height the grayscale one
+        self.grayscale_hist = image_histogram(self.grayscale)
+        self.blurred_hist = image_histogram(self.blurred)
+        if threshold_provider is None:
+            self.grayscale_thresholds = multiotsu_thresholds(self.grayscale_hist, classes=3)
+            self.blurred_thresholds = multiotsu_thresholds(self.blurred_hist, classes=3)
+        else:
+            self.grayscale_thresholds = threshold_provider.thresholds(self.grayscale_hist, 'grayscale')
+            self.blurred_thresholds = threshold_provider.thresholds(self.blurred_hist, 'blurred')
 
-    # Step 2: Convert the image to grayscale
-    grayscale_image = convert_to_grayscale(image)
-    show_image(grayscale_image, True)
+    # Binary mask of the glasses/bottles: everything above the lower grayscale threshold
+    def glass_mask(self):
+        return mask_above(self.grayscale, self.grayscale_thresholds[0])
 
-    # Step 3: Sharpen the grayscale image to enhance features
-    sharpened_image = sharpen_image(grayscale_image)
-    show_image(sharpened_image, True)
+# Build the container index of an image, e.g. a reference frame of a fixed camera
+def build_container_index(image, threshold_provider=None):
+    return ContainerIndex.from_mask(ImageAnalysis(image, threshold_provider).glass_mask(), min_area=1000)
 
-    # Step 4: Apply Gaussian blur to smooth the image and reduce noise
-    blurred = cv2.GaussianBlur(sharpened_image, (3, 3), 0)
-    show_image(blurred, True)
+# Run the whole pipeline on a loaded image without displaying anything.
+# Returns every intermediate stage so callers can show or save them.
+# Pass the container_index of a reference frame to reuse the container geometry of a
+# fixed camera; otherwise the containers are found in this image.
+def run_pipeline(image, verbose=False, threshold_provider=None, container_index=None):
+    # Steps 2-4: Grayscale, sharpen, blur and compute the thresholds once
+    analysis = ImageAnalysis(image, threshold_provider)
 
     # Step 5: Use multi-Otsu thresholding to segment the liquid in the image
-    liquid_mask = apply_multi_otsu_threshold(blurred)
-    show_image(liquid_mask, True)
+    liquid_mask = apply_multi_otsu_threshold(analysis.blurred, analysis.blurred_thresholds)
 
     # Step 6: Refine contours by applying further morphological operations
     refined_mask = refine_contours(liquid_mask)
-    show_image(refined_mask, True)
 
-    # Step 7: Detect the average glass height from the image
-    glass_height = int(get_avg_glass_height(grayscale_image)) - 10 # Subtract a small buffer
+    # Step 7: Index the glass containers; their average height is the fallback glass height
+    if container_index is None:
+        container_index = ContainerIndex.from_mask(analysis.glass_mask(), min_area=1000)
+    glass_height = int(container_index.average_height()) - 10 # Subtract a small buffer
+    if verbose:
+        print(f"Total Glasses Detected: {len(container_index)}")
+        print(f"Average Glass Height: {container_index.average_height()} pixels")
+
+    # Step 8: Measure the liquid fill level of every glass against its own container
+    glasses = measure_glasses(refined_mask, glass_height, container_index)
+
+    return {
+        'grayscale': analysis.grayscale,
+        'sharpened': analysis.sharpened,
+        'blurred': analysis.blurred,
+        'liquid_mask': liquid_mask,
+        'refined_mask': refined_mask,
+        'glass_height': glass_height,
+        'containers': container_index,
+        'glasses': glasses,
+    }
+
+# Main processing function to handle the image processing pipeline
+def process_image(image_path):
+    # Step 1: Load the image
+    image = cv2.imread(image_path)
+
+    # Steps 2-8: Run the pipeline, then show each stage
+    stages = run_pipeline(image, verbose=True)
+    for stage in ('grayscale', 'sharpened', 'blurred', 'liquid_mask', 'refined_mask'):
+        show_image(stages[stage], True)
 
-    # Step 8: Detect and label glasses based on their liquid fill level
-    detect_and_label_glasses(image, refined_mask, glass_height)
+    # Label the glasses based on their liquid fill level
+    draw_glass_labels(image, stages['glasses'])
+    show_image(image)
+    print(f"Total liquid Detected glasses : {len(stages['glasses'])}")
 
 # Run the image processing pipeline on the provided image file
-process_image('main5.png')
+if __name__ == '__main__':
+    process_image('main5.png')
@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+from skimage.filters import threshold_multiotsu
+
+
+# Compute the 256-bin histogram of a uint8 grayscale image in one pass
+def image_histogram(image):
+    return cv2.calcHist([image], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+
+
+# Multi-Otsu thresholds from a 256-bin histogram, identical to threshold_multiotsu(image)
+def multiotsu_thresholds(hist, classes=3):
+    # skimage bins a uint8 image over its own min..max range, so trim the empty tails the same way
+    occupied = np.flatnonzero(hist)
+    low, high = occupied[0], occupied[-1]
+    bin_centers = np.arange(low, high + 1)
+    return threshold_multiotsu(classes=classes, hist=(hist[low:high + 1], bin_centers))
+
+
+# uint8 mask of the pixels brighter than the threshold, i.e. np.where(image > t, 255, 0)
+def mask_above(image, threshold):
+    _, mask = cv2.threshold(image, int(np.floor(threshold)), 255, cv2.THRESH_BINARY)
+    return mask
+
+
+# uint8 mask of the pixels in (t1, t2], i.e. the int64 np.where(image > t1) - np.where(image > t2) as 0/255
+def mask_between(image, t1, t2):
+    return cv2.inRange(image, int(np.floor(t1)) + 1, int(np.floor(t2)))
+
+
+# Between-class variance term first_moment^2 / zeroth_moment of every class, 0 for empty classes
+def _class_variance(zeroth_moment, first_moment):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = first_moment * first_moment / zeroth_moment
+    return np.where(zeroth_moment > 0, variance, 0.0)
+
+
+# Three-class multi-Otsu from a 256-bin histogram with one vectorized O(L^2) search
+# over every (t1, t2) pair instead of skimage's recursive loop
+def fast_multiotsu_thresholds(hist):
+    hist = np.asarray(hist, dtype=np.float64)
+    occupied = np.flatnonzero(hist)
+    if len(occupied) < 3:
+        raise ValueError("The histogram has fewer than 3 distinct values and cannot be split in 3 classes.")
+    if len(occupied) == 3:
+        return occupied[:-1]  # Same shortcut as skimage: split between the three values
+
+    # Like skimage, work on the occupied min..max range of the histogram
+    low, high = occupied[0], occupied[-1]
+    prob = hist[low:high + 1] / hist[low:high + 1].sum()
+    nbins = len(prob)
+
+    # Cumulative zeroth and first moments. skimage seeds the first moment with prob[0]
+    # rather than 0 * prob[0]; do the same so the thresholds agree.
+    weighted = np.arange(nbins) * prob
+    weighted[0] = prob[0]
+    zeroth_moment = np.cumsum(prob)
+    first_moment = np.cumsum(weighted)
+
+    # Classes are [0, i], (i, j] and (j, nbins - 1] for every i < j
+    i = np.arange(nbins - 2)[:, None]
+    j = np.arange(1, nbins - 1)[None, :]
+    sigma = (_class_variance(zeroth_moment[i], first_moment[i])
+             + _class_variance(zeroth_moment[j] - zeroth_moment[i], first_moment[j] - first_moment[i])
+             + _class_variance(zeroth_moment[-1] - zeroth_moment[j], first_moment[-1] - first_moment[j]))
+    sigma[j <= i] = -np.inf
+
+    # argmax keeps the first maximum in (t1, t2) order, like skimage's strict comparison
+    t1, t2 = np.unravel_index(np.argmax(sigma), sigma.shape)
+    return np.array([low + t1, low + t2 + 1])
+
+
+# Multi-Otsu thresholds for a fixed camera. Consecutive frames have nearly identical
+# histograms, so the thresholds are reused while the histogram stays within `tolerance`
+# (total variation distance, 0-1) of the one they were computed from. With `ema_alpha`
+# the histogram is first smoothed by an exponential moving average over the frames.
+class ThresholdProvider:
+    def __init__(self, tolerance=0.02, ema_alpha=None):
+        self.tolerance = tolerance
+        self.ema_alpha = ema_alpha
+        self.smoothed = {}  # Moving-average histogram per key
+        self.cache = {}  # (reference histogram, thresholds) per key
+        self.stats = {'hits': 0, 'misses': 0}
+
+    # Thresholds for this histogram; `key` keeps separate caches for different images of a frame
+    def thresholds(self, hist, key='default'):
+        prob = np.asarray(hist, dtype=np.float64)
+        prob = prob / prob.sum()
+
+        if self.ema_alpha is not None:
+            previous = self.smoothed.get(key)
+            if previous is not None:
+                prob = self.ema_alpha * prob + (1 - self.ema_alpha) * previous
+            self.smoothed[key] = prob
+
+        cached = self.cache.get(key)
+        if cached is not None and 0.5 * np.abs(prob - cached[0]).sum() <= self.tolerance:
+            self.stats['hits'] += 1
+            return cached[1]
+
+        self.stats['misses'] += 1
+        thresholds = fast_multiotsu_thresholds(prob)
+        self.cache[key] = (prob, thresholds)
+        return thresholds
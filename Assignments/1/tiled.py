@@ -0,0 +1,339 @@
+import argparse
+import json
+
+import cv2
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from final import convert_to_grayscale, sharpen_image, refine_contours, glass_records
+from thresholds import image_histogram, multiotsu_thresholds, mask_above, mask_between
+from components import fill_holes, glass_table, select_by_contour_area, traced_contour_area
+from containers import ContainerIndex
+
+# Kernel sizes of the pipeline steps (see final.py); a step with a k x k kernel reads
+# k // 2 pixels around each output pixel, so a tile needs that much halo per step
+SHARPEN_KERNEL_SIZE = 3
+BLUR_KERNEL_SIZE = 3
+REFINE_KERNEL_SIZE = 10
+REFINE_PASSES = 4  # Closing is a dilation and an erosion, then two more erosions
+
+# Halo of the blurred image, and of the refined liquid mask on top of it
+FILTER_HALO = SHARPEN_KERNEL_SIZE // 2 + BLUR_KERNEL_SIZE // 2
+REFINE_HALO = FILTER_HALO + REFINE_PASSES * (REFINE_KERNEL_SIZE // 2)
+
+
+# Open an image for tiled reading. A .npy file is memory-mapped, so only the tiles being
+# processed are ever in memory; other formats have to be decoded whole by OpenCV.
+def open_image(path):
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Unable to load image {path}")
+    return image
+
+
+# Yield the (y0, y1, x0, x1) core of every tile in raster order
+def tile_grid(shape, tile_size):
+    height, width = shape[:2]
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield y0, min(y0 + tile_size, height), x0, min(x0 + tile_size, width)
+
+
+# Run the filter steps on a tile read with `halo` extra pixels on every side (clipped at the
+# image border, where the filters pad the same way they do on the whole image) and return
+# the grayscale and blurred cores
+def filter_tile(image, core, halo):
+    y0, y1, x0, x1 = core
+    top, left = max(y0 - halo, 0), max(x0 - halo, 0)
+    bottom, right = min(y1 + halo, image.shape[0]), min(x1 + halo, image.shape[1])
+
+    grayscale = convert_to_grayscale(np.ascontiguousarray(image[top:bottom, left:right]))
+    blurred = cv2.GaussianBlur(sharpen_image(grayscale), (BLUR_KERNEL_SIZE, BLUR_KERNEL_SIZE), 0)
+    crop = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+    return grayscale, blurred, crop
+
+
+# Global grayscale and blurred histograms, streamed tile by tile
+def streamed_histograms(image, tile_size):
+    grayscale_hist = np.zeros(256, dtype=np.int64)
+    blurred_hist = np.zeros(256, dtype=np.int64)
+    for core in tile_grid(image.shape, tile_size):
+        grayscale, blurred, crop = filter_tile(image, core, FILTER_HALO)
+        grayscale_hist += image_histogram(np.ascontiguousarray(grayscale[crop]))
+        blurred_hist += image_histogram(np.ascontiguousarray(blurred[crop]))
+    return grayscale_hist, blurred_hist
+
+
+# Pack pairs of global ids into single int64 keys, so they can be deduplicated with a 1-D unique
+def pack(first, second):
+    return (first.astype(np.int64) << 32) | second
+
+
+# Unpack int64 keys into an (N, 2) array of global id pairs
+def unpack(keys):
+    return np.stack([keys >> 32, keys & 0xFFFFFFFF], axis=1)
+
+
+# Connected components of a binary mask fed tile by tile in raster order, stitched across
+# tile borders. It finds what external_components finds on the whole mask: 8-connected
+# foreground components with their holes filled, minus the ones nested inside a hole.
+#
+# Every tile component (foreground 8-connected, background 4-connected) gets a global id.
+# Components touching across a tile border are unioned, using only the row above and the
+# column left of the tile, and the foreground/background adjacencies are counted. At the
+# end the unions are resolved in one graph pass and holes are assigned to the components
+# around them. Memory is bounded by the tile, one image row, the component count and the
+# contour pixels on the tile borders.
+class ComponentStitcher:
+    def __init__(self, shape):
+        self.height, self.width = shape[:2]
+        self.next_id = 0
+        # Global id and class (1 foreground, 0 background, -1 outside) of the row above the tile row
+        self.above_ids = np.full(self.width + 2, -1, dtype=np.int64)
+        self.above_class = np.full(self.width + 2, -1, dtype=np.int8)
+        self.next_above_ids = self.above_ids.copy()
+        self.next_above_class = self.above_class.copy()
+        self.left_ids = self.left_class = None
+        # Per global id: bbox, pixel count, foreground flag, image border flag
+        self.boxes, self.counts, self.foreground, self.on_border = [], [], [], []
+        self.unions = []  # Packed pairs of global ids of the same component
+        self.adjacent = []  # (packed foreground and background id, boundary pixel count)
+        self.shared_pixels = []  # (pixel, foreground id, background id or -1 for the outside)
+
+    # Add the tile of the mask at `core`
+    def add_tile(self, mask, core):
+        y0, y1, x0, x1 = core
+        h, w = mask.shape
+        foreground = mask > 0
+        ids = self._label_tile(foreground, y0, x0)
+
+        # The tile with the row above (x0 - 1 .. x1) and the column to its left around it;
+        # the column to its right belongs to the next tile and is left unknown
+        ext_ids = np.full((h + 1, w + 2), -1, dtype=np.int64)
+        ext_class = np.full((h + 1, w + 2), -1, dtype=np.int8)
+        ext_ids[0], ext_class[0] = self.above_ids[x0:x1 + 2], self.above_class[x0:x1 + 2]
+        if x0 > 0:
+            ext_ids[1:, 0], ext_class[1:, 0] = self.left_ids, self.left_class
+        ext_ids[1:, 1:w + 1], ext_class[1:, 1:w + 1] = ids, foreground
+        rows, cols = np.mgrid[y0 - 1:y1, x0 - 1:x1 + 1]
+        pixels = rows * self.width + cols
+
+        # 4-neighbours unite background and foreground, diagonals only foreground
+        neighbours = [((slice(1, h + 1), slice(0, w + 1)), (slice(1, h + 1), slice(1, w + 2)), True),
+                      ((slice(0, h), slice(1, w + 1)), (slice(1, h + 1), slice(1, w + 1)), True),
+                      ((slice(0, h), slice(0, w + 1)), (slice(1, h + 1), slice(1, w + 2)), False),
+                      ((slice(0, h), slice(1, w + 2)), (slice(1, h + 1), slice(0, w + 1)), False)]
+        boundary = []
+        for a, b, four_connected in neighbours:
+            class_a, class_b = ext_class[a], ext_class[b]
+            known = (class_a >= 0) & (class_b >= 0)
+            same = known & (class_a == class_b) & (four_connected | (class_a == 1)) & (ext_ids[a] != ext_ids[b])
+            self.unions.append(np.unique(pack(ext_ids[a][same], ext_ids[b][same])))
+            if four_connected:
+                # Foreground pixel next to a background pixel: (pixel, foreground id, background id)
+                for fg, bg in ((a, b), (b, a)):
+                    edge = known & (ext_class[fg] == 1) & (ext_class[bg] == 0)
+                    boundary.append(np.stack([pixels[fg][edge], ext_ids[fg][edge], ext_ids[bg][edge]], axis=1))
+
+        # Foreground pixels on the image border are contour pixels too, next to the outside (-1)
+        on_edge = np.zeros_like(foreground)
+        on_edge[:, 0] |= x0 == 0
+        on_edge[:, -1] |= x1 == self.width
+        on_edge[0, :] |= y0 == 0
+        on_edge[-1, :] |= y1 == self.height
+        on_edge &= foreground
+        on_edge_rows = np.stack([pixels[1:, 1:w + 1][on_edge], ids[on_edge], np.full(on_edge.sum(), -1)], axis=1)
+        self._count_boundary(np.concatenate(boundary + [on_edge_rows]), core)
+
+        # Remember the borders the next tiles touch
+        self.next_above_ids[x0 + 1:x1 + 1], self.next_above_class[x0 + 1:x1 + 1] = ids[-1], foreground[-1]
+        self.left_ids, self.left_class = ids[:, -1].copy(), foreground[:, -1].astype(np.int8)
+        if x1 == self.width:
+            self.above_ids, self.next_above_ids = self.next_above_ids, self.above_ids.copy()
+            self.above_class, self.next_above_class = self.next_above_class, self.above_class.copy()
+
+    # Label the tile's foreground and background and give every component a global id
+    def _label_tile(self, foreground, y0, x0):
+        ids = np.empty(foreground.shape, dtype=np.int64)
+        for is_foreground, connectivity in ((True, 8), (False, 4)):
+            region = foreground if is_foreground else ~foreground
+            n, labels, stats, _ = cv2.connectedComponentsWithStats(
+                region.view(np.uint8), connectivity=connectivity)
+            ids[region] = self.next_id - 1 + labels[region]
+            stats = stats[1:]
+            x, y = stats[:, cv2.CC_STAT_LEFT] + x0, stats[:, cv2.CC_STAT_TOP] + y0
+            w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+            self.boxes.append(np.stack([x, y, x + w, y + h], axis=1))
+            self.counts.append(stats[:, cv2.CC_STAT_AREA])
+            self.foreground.append(np.full(n - 1, is_foreground))
+            self.on_border.append((x == 0) | (y == 0) | (x + w == self.width) | (y + h == self.height))
+            self.next_id += n - 1
+        return ids
+
+    # Count the boundary pixels of every (foreground, background) pair. A contour pixel is
+    # counted once however many outside background components it touches, so the pixels next
+    # to more than one background component, on the image border, or on the tile border
+    # (whose other neighbours come with the next tiles) are kept whole for finish.
+    def _count_boundary(self, rows, core):
+        y0, y1, x0, x1 = core
+        rows = rows[np.lexsort((rows[:, 2], rows[:, 0]))]
+        distinct = np.ones(len(rows), dtype=bool)
+        distinct[1:] = np.any(rows[1:, [0, 2]] != rows[:-1, [0, 2]], axis=1)
+        rows = rows[distinct]
+
+        _, inverse, backgrounds = np.unique(rows[:, 0], return_inverse=True, return_counts=True)
+        row, col = np.divmod(rows[:, 0], self.width)
+        on_edge = np.bincount(inverse, rows[:, 2] < 0, minlength=len(backgrounds)) > 0
+        shared = (backgrounds[inverse] > 1) | on_edge[inverse] | (row < y0) | (row == y1 - 1) | (col < x0) | (col == x1 - 1)
+        # Every pair is kept for the hole assignment, with the pixels it alone counts
+        inner = rows[:, 2] >= 0
+        pairs, inverse = np.unique(pack(rows[inner, 1], rows[inner, 2]), return_inverse=True)
+        counts = np.bincount(inverse.ravel(), ~shared[inner], minlength=len(pairs)).astype(np.int64)
+        self.adjacent.append(np.column_stack([pairs, counts]))
+        self.shared_pixels.append(rows[shared])
+
+    # Resolve the stitched components. Returns the stats rows (x, y, w, h, filled area) of the
+    # external components and the bounds of their contour areas, as components.contour_area_bounds.
+    def finish(self):
+        n = self.next_id
+        unions = unpack(np.concatenate(self.unions))
+        graph = coo_matrix((np.ones(len(unions)), (unions[:, 0], unions[:, 1])), shape=(n, n))
+        count, root = connected_components(graph, directed=False)
+
+        boxes = np.concatenate(self.boxes)
+        x0, y0 = np.full(count, self.width), np.full(count, self.height)
+        x1, y1 = np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64)
+        np.minimum.at(x0, root, boxes[:, 0])
+        np.minimum.at(y0, root, boxes[:, 1])
+        np.maximum.at(x1, root, boxes[:, 2])
+        np.maximum.at(y1, root, boxes[:, 3])
+        pixels = np.bincount(root, np.concatenate(self.counts), minlength=count)
+        foreground = np.zeros(count, dtype=bool); foreground[root] = np.concatenate(self.foreground)
+        on_border = np.bincount(root, np.concatenate(self.on_border), minlength=count) > 0
+
+        # Adjacent (foreground, background) component pairs and their boundary pixels
+        adjacent = np.concatenate(self.adjacent)
+        pairs, inverse = np.unique(pack(*root[unpack(adjacent[:, 0])].T), return_inverse=True)
+        boundary = np.bincount(inverse.ravel(), adjacent[:, 1], minlength=len(pairs))
+        fg, bg = unpack(pairs).T
+
+        # Background touching the image border is outside every component. A foreground
+        # component is external if it touches the border or that outside background.
+        outside = ~foreground & on_border
+        external = foreground & on_border
+        external[fg[outside[bg]]] = True
+
+        # Every other background component is a hole of the adjacent component with the
+        # largest box around it; every other foreground component sits in a hole that is
+        # not one of its own
+        parent = np.arange(count)
+        box_area = (x1 - x0) * (y1 - y0)
+        hole_pairs = np.flatnonzero(~outside[bg])
+        order = hole_pairs[np.lexsort((-box_area[fg[hole_pairs]], bg[hole_pairs]))]
+        holes, first = np.unique(bg[order], return_index=True)
+        parent[holes] = fg[order[first]]
+        nested_pairs = hole_pairs[~external[fg[hole_pairs]] & (parent[bg[hole_pairs]] != fg[hole_pairs])]
+        parent[fg[nested_pairs]] = bg[nested_pairs]
+
+        # Follow the parents up to the external components and fill them with everything inside
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        inside = ~outside
+        filled = np.bincount(parent[inside], pixels[inside], minlength=count)
+
+        # Contour pixels: next to the outside background or on the image border, each once
+        contour = np.bincount(fg, boundary * outside[bg], minlength=count)
+        shared = np.concatenate(self.shared_pixels)
+        shared = shared[(shared[:, 2] < 0) | outside[root[np.maximum(shared[:, 2], 0)]]]
+        _, first = np.unique(shared[:, 0], return_index=True)
+        contour += np.bincount(root[shared[first, 1]], minlength=count)
+
+        keep = np.flatnonzero(external)
+        keep = keep[np.lexsort((x0[keep], y0[keep]))]  # Top to bottom, then left to right
+        stats = np.stack([x0[keep], y0[keep], x1[keep] - x0[keep], y1[keep] - y0[keep], filled[keep]], axis=1)
+        return (stats.astype(np.int64), np.maximum(filled[keep] - contour[keep] - 1, 0),
+                np.maximum(filled[keep] - contour[keep] / 2 - 1, 0))
+
+
+# Contour area of a stitched component, traced on the mask of its box made again by
+# mask_of(core): the component is the one spanning the whole box with the same filled
+# area. Should none match, its filled area (also an upper bound) is returned.
+def region_contour_area(mask_of, row):
+    x, y, w, h, area = row
+    filled = fill_holes(mask_of((y, y + h, x, x + w)))
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8)
+    match = np.flatnonzero((stats[:, cv2.CC_STAT_LEFT] == 0) & (stats[:, cv2.CC_STAT_TOP] == 0) &
+                           (stats[:, cv2.CC_STAT_WIDTH] == w) & (stats[:, cv2.CC_STAT_HEIGHT] == h) &
+                           (stats[:, cv2.CC_STAT_AREA] == area))
+    match = match[match > 0]
+    return traced_contour_area(labels, stats, match[0]) if len(match) else area
+
+
+# External components of at least min_area pixels (contour area), like external_components.
+# The few whose bounds straddle min_area are traced on their box of the mask made by mask_of.
+def stitched_components(stitcher, mask_of, min_area=1000):
+    stats, low, high = stitcher.finish()
+    return stats[select_by_contour_area(low, high, min_area, lambda index: region_contour_area(mask_of, stats[index]))]
+
+
+# Run the fill-level pipeline of final.py over tiles of a large image with bounded memory.
+# Pass 1 streams the histograms for global multi-Otsu thresholds; pass 2 filters every
+# tile with the halo its kernels need, thresholds and refines it, and stitches the liquid
+# and glass components across the tiles. No full-size intermediate image is created.
+def run_tiled_pipeline(image, tile_size=2048, verbose=False, container_index=None):
+    grayscale_hist, blurred_hist = streamed_histograms(image, tile_size)
+    grayscale_thresholds = multiotsu_thresholds(grayscale_hist, classes=3)
+    blurred_thresholds = multiotsu_thresholds(blurred_hist, classes=3)
+
+    # Liquid and glass masks of any region, for the components that have to be traced
+    def liquid_mask_of(core):
+        _, blurred, crop = filter_tile(image, core, REFINE_HALO)
+        return np.ascontiguousarray(refine_contours(mask_between(blurred, *blurred_thresholds))[crop])
+
+    def glass_mask_of(core):
+        grayscale, _, crop = filter_tile(image, core, FILTER_HALO)
+        return mask_above(np.ascontiguousarray(grayscale[crop]), grayscale_thresholds[0])
+
+    liquid = ComponentStitcher(image.shape)
+    glass = ComponentStitcher(image.shape) if container_index is None else None
+    for core in tile_grid(image.shape, tile_size):
+        grayscale, blurred, crop = filter_tile(image, core, REFINE_HALO)
+        liquid_mask = refine_contours(mask_between(blurred, *blurred_thresholds))
+        liquid.add_tile(np.ascontiguousarray(liquid_mask[crop]), core)
+        if glass is not None:
+            glass.add_tile(mask_above(np.ascontiguousarray(grayscale[crop]), grayscale_thresholds[0]), core)
+
+    if container_index is None:
+        container_index = ContainerIndex(stitched_components(glass, glass_mask_of)[:, :4])
+    glass_height = int(container_index.average_height()) - 10 # Subtract a small buffer
+    if verbose:
+        print(f"Total Glasses Detected: {len(container_index)}")
+        print(f"Average Glass Height: {container_index.average_height()} pixels")
+
+    table = glass_table(stitched_components(liquid, liquid_mask_of), glass_height, container_index)
+    return {
+        'glass_height': glass_height,
+        'containers': container_index,
+        'glasses': glass_records(table),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tiled liquid fill inspection for very large images.')
+    parser.add_argument('image', help='image file; a .npy array is memory-mapped instead of loaded')
+    parser.add_argument('--tile-size', type=int, default=2048, help='tile side in pixels')
+    parser.add_argument('--results', default=None, help='optionally write the glasses to this JSON file')
+    args = parser.parse_args()
+
+    result = run_tiled_pipeline(open_image(args.image), args.tile_size, verbose=True)
+    for glass in result['glasses']:
+        print(f"({glass['x']}, {glass['y']}) {glass['w']}x{glass['h']}: {glass['label']}")
+    if args.results is not None:
+        with open(args.results, 'w') as results_file:
+            json.dump({'glass_height': result['glass_height'], 'glasses': result['glasses']}, results_file, indent=2)
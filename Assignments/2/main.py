@@ -1,6 +1,7 @@
 import cv2
-import numpy as np
 import matplotlib.pyplot as plt
+from skin_lut import load_skin_table
+from skin import segment_skin, parse_morphology, DEFAULT_MORPHOLOGY
 
 # Step 1: Load the image
 img = cv2.imread("a.png")
@@ -8,24 +9,12 @@ img = cv2.imread("a.png")
 # Step 2: Convert the image from BGR to YCbCr color space
 img_YCrCb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
 
-# Step 3: Define the skin color range in YCbCr color space
-# Cr: 135-180, Cb: 85-135
-lower_skin = np.array([0, 135, 85], dtype=np.uint8)  # Lower bound for skin color
-upper_skin = np.array([255, 180, 135], dtype=np.uint8)  # Upper bound for skin color
+# Step 3: Load the skin color table of the YCbCr rule (Cr: 135-180, Cb: 85-135, see skin_lut.py)
+skin_table = load_skin_table('ycrcb')
 
-# Step 4: Create a binary mask for skin colors
-skin_mask = cv2.inRange(img_YCrCb, lower_skin, upper_skin)
-
-# Step 5: Apply morphological operations to reduce noise
-# Applying morphological opening to remove small noise in the mask
-kernel = np.ones((3, 3), np.uint8)
-skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_OPEN, kernel)
-
-# Step 6: Apply morphological closing to fill small holes
-skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_CLOSE, kernel)
-
-# Step 7: Segment the skin area from the original image using the mask
-skin_segmented = cv2.bitwise_and(img, img, mask=skin_mask)
+# Step 4-7: Create a binary mask for skin colors, apply morphological opening to remove
+# small noise and closing to fill small holes, then segment the skin area from the image
+skin_mask, skin_segmented = segment_skin(img, skin_table, parse_morphology(DEFAULT_MORPHOLOGY['ycrcb']))
 
 # Step 8: Convert the original BGR image to RGB for displaying with Matplotlib
 img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
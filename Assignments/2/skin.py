@@ -0,0 +1,181 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import cv2
+import numpy as np
+
+from skin_lut import SKIN_RULES, load_skin_table, skin_mask
+from skin_model import SkinColorModel
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Post-processing of each rule, after the skin scripts: main.py opens and closes the YCrCb
+# mask; try2.py opens the HSV and YCrCb masks before ANDing them, then smooths the result
+# with a median blur and opens it again. The combined rule here is one lookup, so its
+# opening runs on the combined mask instead.
+DEFAULT_MORPHOLOGY = {
+    'ycrcb': 'open:3,close:3',
+    'hsv': 'open:3',
+    'combined': 'open:3,median:3,open:4',
+}
+
+CSV_FIELDS = ['image', 'rule', 'width', 'height', 'skin_pixels', 'skin_ratio', 'seconds', 'error']
+
+# Per-worker skin table or learned model and post-processing steps, set up by init_worker
+skin_table = None
+skin_model = None
+morphology_steps = None
+
+
+# Parse a post-processing spec such as "open:3,median:3,open:4" into (operation, size) steps
+def parse_morphology(spec):
+    steps = []
+    for step in filter(None, spec.split(',')):
+        operation, _, size = step.partition(':')
+        if operation not in ('open', 'close', 'erode', 'dilate', 'median') or not size.isdigit():
+            raise ValueError(f"Invalid morphology step '{step}', expected e.g. open:3 or median:3")
+        steps.append((operation, int(size)))
+    return steps
+
+
+# Apply the post-processing steps to a skin mask
+def apply_morphology(mask, steps):
+    operations = {'open': cv2.MORPH_OPEN, 'close': cv2.MORPH_CLOSE,
+                  'erode': cv2.MORPH_ERODE, 'dilate': cv2.MORPH_DILATE}
+    for operation, size in steps:
+        if operation == 'median':
+            mask = cv2.medianBlur(mask, size)
+        else:
+            mask = cv2.morphologyEx(mask, operations[operation], np.ones((size, size), np.uint8))
+    return mask
+
+
+# Segment the skin of a BGR image: table lookup (or a learned model's back-projection),
+# post-processing, then the masked image
+def segment_skin(img, table, steps, model=None):
+    mask = model.predict(img) if model is not None else skin_mask(img, table)
+    mask = apply_morphology(mask, steps)
+    return mask, cv2.bitwise_and(img, img, mask=mask)
+
+
+# Image paths of the inputs without repeats: the images of each directory, and files as
+# given (the shell expands glob patterns)
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.normpath(os.path.join(item, name)) for name in os.listdir(item)
+                                if name.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            paths.append(os.path.normpath(item))
+    return list(dict.fromkeys(paths))
+
+
+# Worker initializer: memory-map the rule's table (or load the model) once per process
+def init_worker(rule, morphology, model_path=None):
+    global skin_table, skin_model, morphology_steps
+    if model_path is not None:
+        skin_model = SkinColorModel.load(model_path)
+    else:
+        skin_table = load_skin_table(rule)
+    morphology_steps = parse_morphology(morphology)
+
+
+# Output name of an image: its path from the batch's common directory, with the extension
+# kept in the name so a.jpg and a.png do not overwrite each other. Images of the same name
+# from different directories go to the matching subdirectories of the output directory.
+def output_name(image_path, base_dir):
+    directory, name = os.path.split(os.path.relpath(os.path.abspath(image_path), base_dir))
+    return os.path.join(directory, name.replace('.', '_'))
+
+
+# Worker: segment one image, save its mask and segmented image, and return its result record
+def segment_image(image_path, rule, output_dir=None, base_dir=None):
+    start = time.perf_counter()
+    img = cv2.imread(image_path)
+    if img is None:
+        return {'image': image_path, 'rule': rule, 'error': 'Unable to load image'}
+
+    try:
+        mask, segmented = segment_skin(img, skin_table, morphology_steps, skin_model)
+        if output_dir is not None:
+            name = os.path.join(output_dir, output_name(image_path, base_dir))
+            os.makedirs(os.path.dirname(name), exist_ok=True)
+            cv2.imwrite(f"{name}_mask.png", mask)
+            cv2.imwrite(f"{name}_skin.png", segmented)
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'rule': rule, 'error': f"{type(exc).__name__}: {exc}"}
+
+    skin_pixels = cv2.countNonZero(mask)
+    return {
+        'image': image_path,
+        'rule': rule,
+        'width': img.shape[1],
+        'height': img.shape[0],
+        'skin_pixels': skin_pixels,
+        'skin_ratio': round(skin_pixels / mask.size, 6),
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+# Write one CSV row per image
+def write_results(results, results_path):
+    with open(results_path, 'w', newline='') as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+# Segment every image in a worker pool and write the per-image results.
+# With a model path, the learned SkinColorModel replaces the rule.
+def run_batch(inputs, results_path, rule='combined', morphology=None, output_dir=None, workers=None,
+              model_path=None):
+    if morphology is None:
+        morphology = DEFAULT_MORPHOLOGY[rule]
+    parse_morphology(morphology)  # Fail before starting the workers
+    if model_path is not None:
+        SkinColorModel.load(model_path)
+        rule = 'model'
+    else:
+        load_skin_table(rule)  # Build the table once here rather than in every worker
+
+    image_paths = collect_images(inputs)
+    base_dir = None
+    if output_dir is not None and image_paths:
+        os.makedirs(output_dir, exist_ok=True)
+        base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in image_paths])
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(rule, morphology, model_path)) as executor:
+        results = list(executor.map(segment_image, image_paths, repeat(rule), repeat(output_dir), repeat(base_dir),
+                                    chunksize=8))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path)
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch skin segmentation with color space rules.')
+    parser.add_argument('inputs', nargs='+', help='image directories or files')
+    parser.add_argument('--rule', choices=sorted(SKIN_RULES), default='combined',
+                        help='skin color rule: YCrCb only, HSV only or both (default: combined)')
+    parser.add_argument('--model', default=None, help='learned skin color model (.npz, see skin_model.py) '
+                                                      'to use instead of the rule')
+    parser.add_argument('--morphology', default=None,
+                        help='post-processing steps, e.g. "open:3,close:3" (default depends on the rule)')
+    parser.add_argument('--output-dir', default=None,
+                        help='save <name>_<ext>_mask.png and <name>_<ext>_skin.png here, in the subdirectories '
+                             'of the images below their common directory')
+    parser.add_argument('--results', default='skin.csv', help='results file (CSV)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    results, elapsed = run_batch(args.inputs, args.results, args.rule, args.morphology, args.output_dir, args.workers,
+                                 args.model)
+    errors = sum('error' in result for result in results)
+    print(f"Segmented {len(results)} images ({errors} errors) in {elapsed:.2f}s")
@@ -0,0 +1,95 @@
+import os
+
+import cv2
+import numpy as np
+
+# Skin color ranges (inRange lower and upper bounds) in each color space
+HSV_SKIN = ((0, 15, 0), (17, 170, 255))
+YCRCB_SKIN = ((0, 135, 85), (255, 180, 135))
+
+# Tables are saved next to this file, one per rule
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# HSV skin rule: uint8 mask (0/255) of the skin pixels of a BGR image
+def hsv_rule(image):
+    return cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), *HSV_SKIN)
+
+
+# YCrCb skin rule: uint8 mask (0/255) of the skin pixels of a BGR image
+def ycrcb_rule(image):
+    return cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb), *YCRCB_SKIN)
+
+
+# Combined rule: skin in both color spaces
+def combined_rule(image):
+    return cv2.bitwise_and(hsv_rule(image), ycrcb_rule(image))
+
+
+SKIN_RULES = {'hsv': hsv_rule, 'ycrcb': ycrcb_rule, 'combined': combined_rule}
+
+
+# 24-bit code of every pixel of a BGR image: B | G << 8 | R << 16.
+# BGRA pixels read as little-endian uint32 are exactly that once the alpha byte is masked.
+def color_codes(image):
+    codes = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA).view('<u4')[..., 0]
+    # Mask in place: a new array from this strided view costs five times the conversion
+    np.bitwise_and(codes, 0xFFFFFF, out=codes)
+    return codes
+
+
+# All 2^24 colors as a 4096x4096 BGR image, the pixel at flat index `code` having that code
+def all_colors():
+    codes = np.arange(1 << 24, dtype=np.uint32)
+    colors = np.stack([codes & 0xFF, (codes >> 8) & 0xFF, codes >> 16], axis=1).astype(np.uint8)
+    return colors.reshape(4096, 4096, 3)
+
+
+# Run a rule on every color once and pack the answers into a 2 MB bit table:
+# bit `code` (little-endian bit order) is set when that color is skin
+def build_skin_table(rule):
+    return np.packbits(rule(all_colors()).ravel() > 0, bitorder='little')
+
+
+# Run both rules on every color once and keep them in a 16 MB byte table: bit 0 of byte
+# `code` is the HSV rule and bit 1 the YCrCb rule for that color
+def build_rule_table():
+    colors = all_colors()
+    return cv2.bitwise_or(cv2.bitwise_and(hsv_rule(colors), 1), cv2.bitwise_and(ycrcb_rule(colors), 2)).ravel()
+
+
+# Load a saved table memory-mapped, building and saving it on first use
+def load_table(name, build, table_dir=TABLE_DIR):
+    path = os.path.join(table_dir, f"skin_lut_{name}.npy")
+    if not os.path.exists(path):
+        # Write to a temporary file first so concurrent processes never read a partial table
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as table_file:
+            np.save(table_file, build())
+        os.replace(temp_path, path)
+    return np.load(path, mmap_mode='r')
+
+
+# Load the packed table of a rule, see load_table
+def load_skin_table(rule='combined', table_dir=TABLE_DIR):
+    return load_table(rule, lambda: build_skin_table(SKIN_RULES[rule]), table_dir)
+
+
+# Load the byte table of both rules, see load_table
+def load_rule_table(table_dir=TABLE_DIR):
+    return load_table('rules', build_rule_table, table_dir)
+
+
+# Skin mask (uint8 0/255) of a BGR image with a single gather from the packed table,
+# identical to running the rule itself
+def skin_mask(image, table):
+    codes = color_codes(image)
+    bits = np.take(table, codes >> 3, mode='clip') >> (codes & 7).astype(np.uint8)
+    return (bits & 1) * np.uint8(255)
+
+
+# HSV and YCrCb masks (uint8 0/255) of a BGR image with a single gather from the byte table
+# of both rules, identical to running each rule itself
+def rule_masks(image, table):
+    rules = np.take(table, color_codes(image), mode='clip')
+    return cv2.compare(cv2.bitwise_and(rules, 1), 0, cv2.CMP_NE), cv2.compare(rules, 1, cv2.CMP_GT)
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+# Channels and value ranges of the chrominance plane of each color space
+COLOR_SPACES = {
+    'ycrcb': (cv2.COLOR_BGR2YCrCb, [1, 2], [0, 256, 0, 256]),  # Cr, Cb
+    'hsv': (cv2.COLOR_BGR2HSV, [0, 1], [0, 180, 0, 256]),  # H, S
+}
+
+
+# Learned skin color model: 2-D chrominance histograms of the skin and non-skin pixels.
+# Colors with P(skin | color) = skin / (skin + non-skin) of at least `threshold` are skin,
+# and an image is classified with a single calcBackProject of that decision table.
+class SkinColorModel:
+    def __init__(self, color_space='ycrcb', bins=64, threshold=0.5):
+        self.color_space = color_space
+        self.bins = bins
+        self.threshold = threshold
+        self.skin = np.zeros((bins, bins), dtype=np.float32)
+        self.non_skin = np.zeros((bins, bins), dtype=np.float32)
+        self._table = None
+
+    # Convert a BGR image to the model's color space
+    def _convert(self, img):
+        return cv2.cvtColor(img, COLOR_SPACES[self.color_space][0])
+
+    # Chrominance histograms of the skin and the non-skin pixels of one labeled image
+    def _histograms(self, converted, skin_mask, non_skin_mask):
+        _, channels, ranges = COLOR_SPACES[self.color_space]
+        bins = [self.bins, self.bins]
+        skin = cv2.calcHist([converted], channels, skin_mask, bins, ranges)
+        non_skin = cv2.calcHist([converted], channels, non_skin_mask, bins, ranges)
+        return skin, non_skin
+
+    # Add labeled images (BGR images and uint8 masks, skin > 0) to the histograms
+    def fit(self, images, masks):
+        for img, mask in zip(images, masks):
+            skin_mask = np.where(mask > 0, 255, 0).astype(np.uint8)
+            skin, non_skin = self._histograms(self._convert(img), skin_mask, cv2.bitwise_not(skin_mask))
+            self.skin += skin
+            self.non_skin += non_skin
+        self._table = None
+        return self
+
+    # Adapt the model to a new frame, e.g. from another camera: the histograms decay by `rate`
+    # and the frame takes the weight they lost. Without a mask the model labels the frame
+    # itself, from the pixels it is at least `confidence` sure about.
+    def update(self, img, mask=None, rate=0.05, confidence=0.8):
+        converted = self._convert(img)
+        if mask is None:
+            probability = self.probability_map(img, converted)
+            skin_mask = np.where(probability >= confidence * 255, 255, 0).astype(np.uint8)
+            non_skin_mask = np.where(probability <= (1 - confidence) * 255, 255, 0).astype(np.uint8)
+        else:
+            skin_mask = np.where(mask > 0, 255, 0).astype(np.uint8)
+            non_skin_mask = cv2.bitwise_not(skin_mask)
+
+        skin, non_skin = self._histograms(converted, skin_mask, non_skin_mask)
+
+        # Scale the frame so it carries `rate` of the model's total weight; when the model
+        # labels the frame itself, the pixels it is unsure about carry none of it
+        total = self.skin.sum() + self.non_skin.sum()
+        weight = rate * total / (img.shape[0] * img.shape[1]) if total > 0 else 1.0
+        self.skin = (1 - rate) * self.skin + weight * skin
+        self.non_skin = (1 - rate) * self.non_skin + weight * non_skin
+        self._table = None
+
+    # P(skin | color) of every histogram bin, 0 where the model has seen no pixels
+    def probability(self):
+        total = self.skin + self.non_skin
+        return np.divide(self.skin, total, out=np.zeros_like(total), where=total > 0)
+
+    # Decision table for calcBackProject: 255 for skin bins, 0 otherwise
+    def _decision_table(self):
+        if self._table is None:
+            self._table = np.where(self.probability() >= self.threshold, 255, 0).astype(np.float32)
+        return self._table
+
+    # Skin mask (uint8 0/255) of a BGR image
+    def predict(self, img):
+        _, channels, ranges = COLOR_SPACES[self.color_space]
+        return cv2.calcBackProject([self._convert(img)], channels, self._decision_table(), ranges, 1)
+
+    # Skin probability of every pixel of a BGR image, scaled to 0-255
+    def probability_map(self, img, converted=None):
+        _, channels, ranges = COLOR_SPACES[self.color_space]
+        if converted is None:
+            converted = self._convert(img)
+        return cv2.calcBackProject([converted], channels, self.probability() * 255, ranges, 1)
+
+    # Save the histograms compressed, a few kB for the default 64x64 bins
+    def save(self, path):
+        np.savez_compressed(path, skin=self.skin, non_skin=self.non_skin, color_space=self.color_space,
+                            threshold=self.threshold)
+
+    # Load a model saved by save
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        model = cls(str(data['color_space']), data['skin'].shape[0], float(data['threshold']))
+        model.skin, model.non_skin = data['skin'], data['non_skin']
+        return model
+
+
+# Pair every image with the mask of the same name in the mask directory
+def labeled_pairs(image_paths, mask_dir):
+    pairs = []
+    for image_path in image_paths:
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        mask_paths = glob.glob(os.path.join(mask_dir, stem + '.*'))
+        if mask_paths:
+            pairs.append((image_path, mask_paths[0]))
+    return pairs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train a skin color histogram model.')
+    parser.add_argument('images', nargs='+', help='training images (directories or files)')
+    parser.add_argument('--masks', default=None,
+                        help='directory of skin masks named like the images; without it the images are '
+                             'labeled with the combined color space rule')
+    parser.add_argument('--color-space', choices=sorted(COLOR_SPACES), default='ycrcb')
+    parser.add_argument('--bins', type=int, default=64)
+    parser.add_argument('--threshold', type=float, default=0.5, help='skin probability threshold')
+    parser.add_argument('--output', default='skin_model.npz')
+    args = parser.parse_args()
+
+    # skin.py imports this module, so import it only when training from the command line
+    from skin import collect_images, segment_skin, parse_morphology, DEFAULT_MORPHOLOGY
+    from skin_lut import load_skin_table
+
+    # np.savez_compressed appends .npz to any other name, so report the file it writes
+    output = args.output if args.output.endswith('.npz') else args.output + '.npz'
+
+    model = SkinColorModel(args.color_space, args.bins, args.threshold)
+    if args.masks is not None:
+        images, masks = [], []
+        for image_path, mask_path in labeled_pairs(collect_images(args.images), args.masks):
+            img, mask = cv2.imread(image_path), cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            if img is None or mask is None:
+                print(f"Skipping {image_path}: unable to load {image_path if img is None else mask_path}")
+                continue
+            images.append(img)
+            masks.append(mask)
+    else:
+        # Bootstrap from the fixed rules: their post-processed masks become the labels
+        table, steps = load_skin_table('combined'), parse_morphology(DEFAULT_MORPHOLOGY['combined'])
+        images = [cv2.imread(path) for path in collect_images(args.images)]
+        images = [img for img in images if img is not None]
+        masks = [segment_skin(img, table, steps)[0] for img in images]
+
+    model.fit(images, masks)
+    model.save(output)
+    print(f"Trained on {len(images)} images, saved {output} ({os.path.getsize(output)} bytes)")
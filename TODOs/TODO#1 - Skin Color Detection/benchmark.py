@@ -0,0 +1,64 @@
+import argparse
+import glob
+import time
+import timeit
+
+import cv2
+import numpy as np
+
+from skin_lut import load_rule_table, load_skin_table, rule_masks, skin_mask, combined_rule, hsv_rule, ycrcb_rule
+
+
+# Original path: HSV and YCrCb conversions, two inRange passes, an opening of each mask and their AND
+def skin_before(img):
+    HSV_mask = cv2.morphologyEx(hsv_rule(img), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    YCrCb_mask = cv2.morphologyEx(ycrcb_rule(img), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    global_mask = cv2.bitwise_and(YCrCb_mask, HSV_mask)
+    global_mask = cv2.medianBlur(global_mask, 3)
+    return cv2.morphologyEx(global_mask, cv2.MORPH_OPEN, np.ones((4, 4), np.uint8))
+
+
+# Table path, as run by main.py: one gather from the table of both rules, then the same
+# openings, AND and post-processing
+def skin_after(img, rule_table):
+    HSV_mask, YCrCb_mask = rule_masks(img, rule_table)
+    HSV_mask = cv2.morphologyEx(HSV_mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    YCrCb_mask = cv2.morphologyEx(YCrCb_mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    global_mask = cv2.bitwise_and(YCrCb_mask, HSV_mask)
+    global_mask = cv2.medianBlur(global_mask, 3)
+    return cv2.morphologyEx(global_mask, cv2.MORPH_OPEN, np.ones((4, 4), np.uint8))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the skin color table against the two color space path.')
+    parser.add_argument('pattern', nargs='?', default='images/[0-9].*')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    skin_table, rule_table = load_skin_table('combined'), load_rule_table()
+    print(f"Skin tables: combined {skin_table.nbytes / 2 ** 20:.0f} MB, both rules {rule_table.nbytes / 2 ** 20:.0f} MB, "
+          f"ready in {time.perf_counter() - start:.2f}s")
+
+    for path in sorted(glob.glob(args.pattern)):
+        img = cv2.imread(path)
+        if img is None:
+            continue
+
+        # The tables must match the rules exactly, and main.py's masks those of the two color
+        # space path
+        exact = (np.array_equal(skin_mask(img, skin_table), combined_rule(img)) and
+                 all(np.array_equal(mask, rule(img)) for mask, rule in zip(rule_masks(img, rule_table),
+                                                                           (hsv_rule, ycrcb_rule))))
+        same = np.array_equal(skin_before(img), skin_after(img, rule_table))
+
+        t_rule = min(timeit.repeat(lambda: combined_rule(img), number=args.number, repeat=args.repeat))
+        t_lookup = min(timeit.repeat(lambda: skin_mask(img, skin_table), number=args.number,
+                                     repeat=args.repeat))
+        t_before = min(timeit.repeat(lambda: skin_before(img), number=args.number, repeat=args.repeat))
+        t_after = min(timeit.repeat(lambda: skin_after(img, rule_table), number=args.number, repeat=args.repeat))
+        t_rule, t_lookup, t_before, t_after = (t / args.number * 1000 for t in (t_rule, t_lookup, t_before, t_after))
+        print(f"{path:16s} {img.shape[1]}x{img.shape[0]:<5d} rule {t_rule:6.2f} ms  lookup {t_lookup:6.2f} ms  "
+              f"identical {exact}  |  pipeline before {t_before:6.2f} ms  after {t_after:6.2f} ms  "
+              f"speedup {t_before / t_after:4.2f}x  identical {same}")
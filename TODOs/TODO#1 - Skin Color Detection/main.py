@@ -1,33 +1,37 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
+from skin_lut import load_rule_table, rule_masks
+from regions import skin_regions, draw_regions
 
 # Step 1: Open a simple image from the specified file
 img = cv2.imread("images/3.jpg")
 
-# Step 2: Convert the image from BGR (Blue, Green, Red) to HSV (Hue, Saturation, Value) color space
-img_HSV = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+# Step 2: Load the precomputed table of both skin color rules (built and saved on the first run)
+rule_table = load_rule_table()
 
-# Step 3: Create a skin color mask in the HSV color space
-HSV_mask = cv2.inRange(img_HSV, (0, 15, 0), (17, 170, 255))
-HSV_mask = cv2.morphologyEx(HSV_mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
-
-# Step 4: Convert the original image from BGR to YCbCr color space
-img_YCrCb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
+# Step 3: Create the skin color masks of the HSV and YCbCr color space rules with one table lookup
+HSV_mask, YCrCb_mask = rule_masks(img, rule_table)
 
-# Step 5: Create a skin color mask in the YCbCr color space
-YCrCb_mask = cv2.inRange(img_YCrCb, (0, 135, 85), (255, 180, 135))
+# Step 4: Apply morphological opening to remove small noise in each mask
+HSV_mask = cv2.morphologyEx(HSV_mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
 YCrCb_mask = cv2.morphologyEx(YCrCb_mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
 
-# Step 6: Merge the two skin detection masks (from YCbCr and HSV color spaces) using bitwise AND
+# Step 5: Merge the two skin detection masks (from YCbCr and HSV color spaces) using bitwise AND
 global_mask = cv2.bitwise_and(YCrCb_mask, HSV_mask)
 
-# Step 7: Apply median blur to smooth the global mask
+# Step 6: Apply median blur to smooth the global mask
 global_mask = cv2.medianBlur(global_mask, 3)
 
-# Step 8: Apply morphological opening to the global mask to remove small noise
+# Step 7: Apply morphological opening to the global mask to remove small noise
 global_mask = cv2.morphologyEx(global_mask, cv2.MORPH_OPEN, np.ones((4, 4), np.uint8))
 
+# Step 8: Find the skin regions (boxes, areas and centroids), ignoring specks under 500 pixels
+regions = skin_regions(global_mask, min_area=500)
+for region in regions:
+    print(f"Region {region.label}: box ({region.x}, {region.y}, {region.w}, {region.h}), "
+          f"area {region.area}, centroid ({region.cx:.1f}, {region.cy:.1f})")
+
 # Step 9: Invert the masks to highlight skin areas in white
 HSV_result = cv2.bitwise_not(HSV_mask)
 YCrCb_result = cv2.bitwise_not(YCrCb_mask)
@@ -35,6 +39,7 @@ global_result = cv2.bitwise_not(global_mask)
 
 # Step 10: Apply the skin mask to the original image to show only the skin areas
 skin = cv2.bitwise_and(img, img, mask=global_mask)
+draw_regions(skin, regions)
 
 # Step 11: Convert the original BGR image to RGB for displaying with Matplotlib
 img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+# One record per skin region
+REGION_DTYPE = np.dtype([
+    ('label', np.int32), ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32),
+    ('area', np.int32), ('cx', np.float64), ('cy', np.float64),
+])
+
+
+# Skin regions of a binary mask as a record array (fields of REGION_DTYPE, e.g. regions.area),
+# largest first. Everything comes from one connectedComponentsWithStats pass, so callers
+# never scan the mask again; with return_labels the label image is returned as well,
+# where the pixels of a region have its `label`.
+def skin_regions(mask, min_area=0, connectivity=8, return_labels=False):
+    _, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=connectivity)
+
+    keep = 1 + np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] >= min_area)  # Label 0 is the background
+    keep = keep[np.argsort(-stats[keep, cv2.CC_STAT_AREA], kind='stable')]
+
+    regions = np.zeros(len(keep), dtype=REGION_DTYPE).view(np.recarray)
+    regions.label = keep
+    regions.x = stats[keep, cv2.CC_STAT_LEFT]
+    regions.y = stats[keep, cv2.CC_STAT_TOP]
+    regions.w = stats[keep, cv2.CC_STAT_WIDTH]
+    regions.h = stats[keep, cv2.CC_STAT_HEIGHT]
+    regions.area = stats[keep, cv2.CC_STAT_AREA]
+    regions.cx, regions.cy = centroids[keep, 0], centroids[keep, 1]
+    return (regions, labels) if return_labels else regions
+
+
+# Draw the box and centroid of every region on an image
+def draw_regions(image, regions, color=(0, 255, 0)):
+    for region in regions:
+        x, y, w, h = int(region.x), int(region.y), int(region.w), int(region.h)
+        cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
+        cv2.circle(image, (int(round(region.cx)), int(round(region.cy))), 4, color, -1)
+    return image
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+import pytest
+
+from skin_lut import hsv_rule, load_rule_table, ycrcb_rule
+from video import POSTPROCESS_HALO, VideoSkinDetector
+
+SKIN = np.array([120, 150, 200], dtype=np.uint8)
+OTHER = np.array([40, 200, 60], dtype=np.uint8)
+
+
+# Frames of mostly skin noise where each frame redraws one whole block, so the changes
+# reach the block edges and the post-processing halo decides the pixels around them
+def changing_frames(seed, count=60, height=96, width=128, block_size=16):
+    rng = np.random.default_rng(seed)
+    frame = np.where((rng.random((height, width)) < 0.8)[..., None], SKIN, OTHER)
+    frames = [frame.copy()]
+    for _ in range(count - 1):
+        y, x = rng.integers(0, height // block_size) * block_size, rng.integers(0, width // block_size) * block_size
+        frame[y:y + block_size, x:x + block_size] = np.where(
+            (rng.random((block_size, block_size)) < 0.8)[..., None], SKIN, OTHER)
+        frames.append(frame.copy())
+    return frames
+
+
+# main.py's detector, step by step from the color space rules
+def main_detector(img):
+    HSV_mask = cv2.morphologyEx(hsv_rule(img), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    YCrCb_mask = cv2.morphologyEx(ycrcb_rule(img), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    global_mask = cv2.bitwise_and(YCrCb_mask, HSV_mask)
+    global_mask = cv2.medianBlur(global_mask, 3)
+    return cv2.morphologyEx(global_mask, cv2.MORPH_OPEN, np.ones((4, 4), np.uint8))
+
+
+def test_halo_covers_post_processing():
+    # 3x3 opening 2, 3x3 median 1, 4x4 opening 4 (its anchor is off-center)
+    assert POSTPROCESS_HALO == 7
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_exact_masks_at_threshold_zero(seed):
+    detector = VideoSkinDetector(load_rule_table(), block_size=16, diff_threshold=0)
+    for frame in changing_frames(seed):
+        np.testing.assert_array_equal(detector.update(frame), main_detector(frame))
+    assert detector.stats['partial'] > 0
@@ -0,0 +1,170 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from skin_lut import load_rule_table, rule_masks
+
+OPEN_SIZES = (3, 4)
+MEDIAN_SIZE = 3
+
+
+# Pixels a size x size opening reads around each output pixel. The erosion and the dilation
+# each reach size // 2 on the far side of the anchor, which is off-center in an even kernel.
+def opening_reach(size):
+    return 2 * (size // 2)
+
+
+# Reach of main.py's post-processing, in pixels: 2 + 1 + 4 = 7
+POSTPROCESS_HALO = opening_reach(OPEN_SIZES[0]) + MEDIAN_SIZE // 2 + opening_reach(OPEN_SIZES[1])
+
+
+# Post-processing of the two rule masks, as in main.py: opening of each, AND, median blur,
+# opening of the combined mask
+def postprocess_masks(hsv_mask, ycrcb_mask):
+    kernel = np.ones((OPEN_SIZES[0], OPEN_SIZES[0]), np.uint8)
+    mask = cv2.bitwise_and(cv2.morphologyEx(ycrcb_mask, cv2.MORPH_OPEN, kernel),
+                           cv2.morphologyEx(hsv_mask, cv2.MORPH_OPEN, kernel))
+    mask = cv2.medianBlur(mask, MEDIAN_SIZE)
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((OPEN_SIZES[1], OPEN_SIZES[1]), np.uint8))
+
+
+class VideoSkinDetector:
+    """main.py's HSV/YCrCb skin detection on video, recomputing only the blocks that changed.
+
+    Each frame is compared with the previous one in ``block_size`` blocks. Blocks whose
+    pixels all changed by at most ``diff_threshold`` keep their mask from the previous frame.
+    The changed blocks are grouped into rectangles, where the table lookup is redone; the
+    post-processing then runs on those rectangles plus the halo it reads. With
+    ``diff_threshold=0`` the masks are identical to running main.py's detector on every frame.
+    When more than ``full_frame_fraction`` of the blocks changed, the whole frame is redone.
+    """
+
+    def __init__(self, table=None, block_size=16, diff_threshold=6, full_frame_fraction=0.5):
+        self.table = load_rule_table() if table is None else table
+        self.block_size = block_size
+        self.diff_threshold = diff_threshold
+        self.full_frame_fraction = full_frame_fraction
+        self.previous = None
+        self.raw_masks = None  # HSV and YCrCb masks of the table lookup, before post-processing
+        self.mask = None
+        self.stats = {'frames': 0, 'full': 0, 'partial': 0, 'unchanged': 0, 'dirty_blocks': 0, 'blocks': 0}
+
+    def update(self, frame):
+        """Return the skin mask of the next frame. Do not modify it; the next call reuses it."""
+        self.stats['frames'] += 1
+        if self.previous is None or self.previous.shape != frame.shape:
+            return self._full(frame)
+
+        dirty = self._dirty_blocks(frame)
+        self.stats['dirty_blocks'] += int(np.count_nonzero(dirty))
+        self.stats['blocks'] += dirty.size
+        if not dirty.any():
+            self.stats['unchanged'] += 1
+        elif np.count_nonzero(dirty) > self.full_frame_fraction * dirty.size:
+            return self._full(frame)
+        else:
+            self.stats['partial'] += 1
+            self._partial(frame, dirty)
+        return self.mask
+
+    # Process the whole frame
+    def _full(self, frame):
+        self.stats['full'] += 1
+        self.previous = frame.copy()
+        self.raw_masks = rule_masks(frame, self.table)
+        self.mask = postprocess_masks(*self.raw_masks)
+        return self.mask
+
+    # Boolean grid of the blocks where some pixel changed by more than the threshold
+    def _dirty_blocks(self, frame):
+        height, width = frame.shape[:2]
+        size = self.block_size
+        diff = cv2.absdiff(frame, self.previous)
+        diff = cv2.copyMakeBorder(diff, 0, -height % size, 0, -width % size, cv2.BORDER_CONSTANT, value=0)
+        rows, cols = diff.shape[0] // size, diff.shape[1] // size
+        # Reduce the rows of each block first, along contiguous memory, then the columns
+        diff = diff.reshape(rows, size, -1).max(axis=1)
+        return diff.reshape(rows, cols, -1).max(axis=2) > self.diff_threshold
+
+    # Redo the lookup in the changed rectangles, then the post-processing around them
+    def _partial(self, frame, dirty):
+        height, width = frame.shape[:2]
+        size, halo = self.block_size, POSTPROCESS_HALO
+        _, _, stats, _ = cv2.connectedComponentsWithStats(dirty.view(np.uint8), connectivity=8)
+        rects = [(x * size, y * size, min((x + w) * size, width), min((y + h) * size, height))
+                 for x, y, w, h, _ in stats[1:]]
+
+        # Only recomputed blocks take the new frame as their reference, so slow drifts in the
+        # other blocks still add up to a change
+        for x0, y0, x1, y1 in rects:
+            for raw_mask, mask in zip(self.raw_masks, rule_masks(frame[y0:y1, x0:x1], self.table)):
+                raw_mask[y0:y1, x0:x1] = mask
+            self.previous[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+
+        # The mask changes up to one halo around the rectangle, and computing it there
+        # needs the lookup one more halo further out
+        for x0, y0, x1, y1 in rects:
+            ox0, oy0 = max(x0 - halo, 0), max(y0 - halo, 0)
+            ox1, oy1 = min(x1 + halo, width), min(y1 + halo, height)
+            cx0, cy0 = max(ox0 - halo, 0), max(oy0 - halo, 0)
+            cx1, cy1 = min(ox1 + halo, width), min(oy1 + halo, height)
+            region = postprocess_masks(*(raw_mask[cy0:cy1, cx0:cx1] for raw_mask in self.raw_masks))
+            self.mask[oy0:oy1, ox0:ox1] = region[oy0 - cy0:oy1 - cy0, ox0 - cx0:ox1 - cx0]
+
+
+# Run skin detection on a video file, stream URL or camera index, optionally showing
+# or saving the segmented skin, and return the detector stats and the frame rate
+def run_video(source, output_path=None, show=False, block_size=16, diff_threshold=6, max_frames=None):
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise ValueError(f"Unable to open video source {source}")
+
+    detector = VideoSkinDetector(block_size=block_size, diff_threshold=diff_threshold)
+    writer = None
+    frames = 0
+    start = time.perf_counter()
+    while max_frames is None or frames < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        mask = detector.update(frame)
+        frames += 1
+
+        if output_path is not None or show:
+            skin = cv2.bitwise_and(frame, frame, mask=mask)
+            if output_path is not None:
+                if writer is None:
+                    fps = capture.get(cv2.CAP_PROP_FPS) or 30
+                    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps,
+                                             (frame.shape[1], frame.shape[0]))
+                writer.write(skin)
+            if show:
+                cv2.imshow("Skin Detection Output", skin)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    elapsed = time.perf_counter() - start
+
+    capture.release()
+    if writer is not None:
+        writer.release()
+    if show:
+        cv2.destroyAllWindows()
+    return detector.stats, frames / elapsed if elapsed > 0 else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Real-time skin detection on a video or camera.')
+    parser.add_argument('source', nargs='?', default='0', help='video file, stream URL or camera index (default: 0)')
+    parser.add_argument('--output', default=None, help='save the segmented skin video here (.mp4)')
+    parser.add_argument('--show', action='store_true', help='show the segmented skin in a window (q quits)')
+    parser.add_argument('--block-size', type=int, default=16, help='side of the change detection blocks in pixels')
+    parser.add_argument('--diff-threshold', type=int, default=6,
+                        help='largest pixel change still treated as unchanged (0: exact)')
+    parser.add_argument('--max-frames', type=int, default=None)
+    args = parser.parse_args()
+
+    stats, fps = run_video(args.source, args.output, args.show, args.block_size, args.diff_threshold, args.max_frames)
+    print(f"{stats['frames']} frames at {fps:.1f} fps: {stats['full']} full, {stats['partial']} partial, "
+          f"{stats['unchanged']} unchanged, {stats['dirty_blocks']}/{stats['blocks']} blocks recomputed")
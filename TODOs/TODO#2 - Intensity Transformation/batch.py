@@ -0,0 +1,139 @@
+import argparse
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+import cv2
+import numpy as np
+
+from intensity_lut import apply_chain, parse_chain
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Formats that can hold 16-bit images; other 16-bit outputs are saved as PNG
+EXTENSIONS_16BIT = ('.png', '.tif', '.tiff')
+
+CSV_FIELDS = ['image', 'output', 'width', 'height', 'channels', 'depth', 'megabytes', 'seconds',
+              'transform_seconds', 'error']
+
+# Per-thread output buffer, reused while the images keep the same shape and depth
+buffers = threading.local()
+
+
+# Image paths of the inputs without repeats: the images of each directory, and files as
+# given (the shell expands glob patterns)
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.normpath(os.path.join(item, name)) for name in os.listdir(item)
+                                if name.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            paths.append(os.path.normpath(item))
+    return list(dict.fromkeys(paths))
+
+
+# This thread's output buffer for an image, reallocated only when the shape or depth changes
+def output_buffer(img):
+    buffer = getattr(buffers, 'image', None)
+    if buffer is None or buffer.shape != img.shape or buffer.dtype != img.dtype:
+        buffer = buffers.image = np.empty_like(img)
+    return buffer
+
+
+# Path of the transformed image in the output directory, keeping the input's name and format
+def output_path(image_path, output_dir, depth):
+    name = os.path.basename(image_path)
+    stem, extension = os.path.splitext(name)
+    if depth == 16 and extension.lower() not in EXTENSIONS_16BIT:
+        name = f"{stem}.png"
+    return os.path.join(output_dir, name)
+
+
+# Worker: apply the chain to one image (8 or 16-bit, grayscale or color), save the result
+# and return its record. OpenCV releases the GIL while decoding, looking up and encoding,
+# so the threads run in parallel.
+def transform_image(image_path, chain, output_dir=None):
+    start = time.perf_counter()
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return {'image': image_path, 'error': 'Unable to load image'}
+
+    depth = 8 * img.itemsize
+    try:
+        transform_start = time.perf_counter()
+        result = apply_chain(img, chain, out=output_buffer(img))
+        transform_seconds = time.perf_counter() - transform_start
+
+        saved = None
+        if output_dir is not None:
+            saved = output_path(image_path, output_dir, depth)
+            if not cv2.imwrite(saved, result):
+                raise OSError(f"Unable to write {saved}")
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'error': f"{type(exc).__name__}: {exc}"}
+
+    return {
+        'image': image_path,
+        'output': saved,
+        'width': img.shape[1],
+        'height': img.shape[0],
+        'channels': 1 if img.ndim == 2 else img.shape[2],
+        'depth': depth,
+        'megabytes': round(img.nbytes / 2 ** 20, 4),
+        'seconds': round(time.perf_counter() - start, 4),
+        'transform_seconds': round(transform_seconds, 6),
+    }
+
+
+# Write one CSV row per image
+def write_results(results, results_path):
+    with open(results_path, 'w', newline='') as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+# Transform every image in a thread pool, write the per-image results and return them with
+# the throughput in MB/s (decoded image data): end to end, and of the lookups alone
+def run_batch(inputs, chain, results_path, output_dir=None, workers=None):
+    chain = parse_chain(chain)  # Fail before starting the workers
+    image_paths = collect_images(inputs)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(transform_image, image_paths, repeat(chain), repeat(output_dir)))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path)
+    megabytes = sum(result.get('megabytes', 0) for result in results)
+    transform_seconds = sum(result.get('transform_seconds', 0) for result in results)
+    throughput = {
+        'megabytes': megabytes,
+        'seconds': elapsed,
+        'mb_per_second': megabytes / elapsed if elapsed > 0 else 0.0,
+        'transform_mb_per_second': megabytes / transform_seconds if transform_seconds > 0 else 0.0,
+    }
+    return results, throughput
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply a chain of intensity transformations to whole directories.')
+    parser.add_argument('inputs', nargs='+', help='image directories or files (8 or 16-bit)')
+    parser.add_argument('--chain', default='stretch',
+                        help='transformations in order, e.g. "negative,gamma:0.5,log,stretch" (default: stretch)')
+    parser.add_argument('--output-dir', default=None, help='save the transformed images here')
+    parser.add_argument('--results', default='intensity.csv', help='results file (CSV)')
+    parser.add_argument('--workers', type=int, default=None, help='worker threads (default: CPU count + 4, at most 32)')
+    args = parser.parse_args()
+
+    results, throughput = run_batch(args.inputs, args.chain, args.results, args.output_dir, args.workers)
+    errors = sum('error' in result for result in results)
+    print(f"Transformed {len(results)} images ({errors} errors), {throughput['megabytes']:.1f} MB in "
+          f"{throughput['seconds']:.2f}s: {throughput['mb_per_second']:.1f} MB/s end to end, "
+          f"{throughput['transform_mb_per_second']:.1f} MB/s in the lookups")
@@ -0,0 +1,106 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+# Every transform builds a table over all input levels. lo and hi are the smallest and largest
+# level of the image it is applied to; all transforms are monotonic, so the range of their
+# output is just the table values at lo and hi.
+
+# Negative: s = L - 1 - r
+def negative_table(lo, hi, levels=256):
+    return (levels - 1) - np.arange(levels, dtype=np.float64)
+
+
+# Gamma correction: s = (r / (L - 1)) ^ (1 / gamma) * (L - 1)
+def gamma_table(lo, hi, gamma, levels=256):
+    return (np.arange(levels) / (levels - 1)) ** (1 / gamma) * (levels - 1)
+
+
+# Log transformation: s = c * log(1 + r), with c mapping the brightest level to L - 1
+def log_table(lo, hi, levels=256):
+    c = (levels - 1) / np.log1p(hi) if hi > 0 else 0.0
+    return c * np.log1p(np.arange(levels, dtype=np.float64))
+
+
+# Contrast stretching: s = (r - lo) / (hi - lo) * (L - 1)
+def stretch_table(lo, hi, levels=256):
+    if hi == lo:  # A flat image has no contrast to stretch
+        return np.arange(levels, dtype=np.float64)
+    return (np.arange(levels) - lo) / (hi - lo) * (levels - 1)
+
+
+TRANSFORMS = {
+    'negative': negative_table,
+    'gamma': gamma_table,
+    'log': log_table,
+    'stretch': stretch_table,
+}
+
+# Transforms whose table depends on the image range
+RANGE_DEPENDENT = ('log', 'stretch')
+
+
+# Parameters of every transform, with a check of each value and what it must be
+PARAMETERS = {
+    'negative': (),
+    'gamma': (('gamma', lambda value: 0 < value < np.inf, 'a positive number'),),
+    'log': (),
+    'stretch': (),
+}
+
+
+# Parse a chain spec such as "negative,gamma:0.5,stretch" into (name, params) steps
+def parse_chain(spec):
+    chain = []
+    for step in filter(None, spec.split(',')):
+        name, *params = step.split(':')
+        if name not in TRANSFORMS:
+            raise ValueError(f"Unknown transform '{name}', expected one of {', '.join(TRANSFORMS)}")
+        expected = PARAMETERS[name]
+        usage = ':'.join([name] + [f"<{param}>" for param, _, _ in expected])
+        if len(params) != len(expected):
+            raise ValueError(f"Transform '{name}' takes {len(expected)} parameter(s), got {len(params)} "
+                             f"in '{step}', expected {usage}")
+        try:
+            values = tuple(float(param) for param in params)
+        except ValueError:
+            raise ValueError(f"Invalid parameters in '{step}', expected {usage} with numbers") from None
+        for value, (param, valid, description) in zip(values, expected):
+            if not valid(value):
+                raise ValueError(f"Invalid {param} {value:g} in '{step}', expected {description}")
+        chain.append((name, values))
+    return tuple(chain)
+
+
+# Compile a chain into one table by composing the tables of its steps. The result is
+# memoized by chain, range and depth, so it is shared and read-only.
+@lru_cache(maxsize=256)
+def compile_chain(chain, lo=0, hi=255, levels=256):
+    dtype = np.uint8 if levels <= 256 else np.uint16
+    table = np.arange(levels, dtype=dtype)
+    for name, params in chain:
+        # Truncate like the astype(np.uint8) of the float formulas
+        step = np.clip(TRANSFORMS[name](lo, hi, *params, levels=levels), 0, levels - 1).astype(dtype)
+        table = step[table]
+        lo, hi = sorted((int(step[lo]), int(step[hi])))
+    table.setflags(write=False)
+    return table
+
+
+# Apply a chain (spec string or parsed steps) to an 8-bit or 16-bit image with a single table
+# lookup, writing into `out` when given (an array of the image's shape and dtype)
+def apply_chain(img, chain, out=None):
+    if isinstance(chain, str):
+        chain = parse_chain(chain)
+    if img.dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"Expected an 8-bit or 16-bit image, got {img.dtype}")
+    levels = 256 if img.dtype == np.uint8 else 65536
+    lo, hi = 0, levels - 1
+    if any(name in RANGE_DEPENDENT for name, _ in chain):
+        lo, hi = int(img.min()), int(img.max())
+    table = compile_chain(chain, lo, hi, levels)
+    if img.dtype == np.uint8:
+        return cv2.LUT(img, table, dst=out)
+    return np.take(table, img, out=out)
@@ -0,0 +1,103 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import cv2
+import numpy as np
+
+from main import classify_histogram, enhance_image, find_image_type, gray_histogram, issue_fractions
+from triage import collect_images, write_results
+
+STAT_NAMES = ['mean', 'std', 'min', 'max', 'dark', 'bright', 'mid']
+
+CSV_FIELDS = (['image', 'type', 'issue', 'enhanced', 'output', 'width', 'height'] +
+              [f"before_{name}" for name in STAT_NAMES] + [f"after_{name}" for name in STAT_NAMES] +
+              ['seconds', 'error'])
+
+
+# Intensity statistics of a 256-bin histogram, plus the fraction of the pixels in the range
+# of each issue (dark, bright, mid), prefixed for the report
+def histogram_stats(hist, prefix):
+    hist = np.ravel(hist).astype(np.float64)
+    levels = np.arange(256)
+    total = hist.sum()
+    mean = (hist * levels).sum() / total
+    present = np.flatnonzero(hist)
+    stats = {
+        'mean': round(mean, 3),
+        'std': round(np.sqrt((hist * (levels - mean) ** 2).sum() / total), 3),
+        'min': int(present[0]),
+        'max': int(present[-1]),
+    }
+    for name, fraction in zip(('dark', 'bright', 'mid'), issue_fractions(hist)):
+        stats[name] = round(fraction, 5)
+    return {f"{prefix}_{name}": value for name, value in stats.items()}
+
+
+# Worker: classify one image, enhance and save it unless it is normal, and return its record.
+# Normal images are neither re-encoded nor rewritten, and their classification histogram
+# doubles as the "after" histogram.
+def fix_image(image_path, output_dir=None):
+    start = time.perf_counter()
+    image = cv2.imread(image_path)
+    if image is None:
+        return {'image': image_path, 'error': 'Unable to load image'}
+
+    try:
+        hist = gray_histogram(image, parallel=False)
+        issue = classify_histogram(hist)
+        record = {'image': image_path, 'type': find_image_type(image), 'issue': issue,
+                  'enhanced': issue != 'Normal', 'output': None,
+                  'width': image.shape[1], 'height': image.shape[0]}
+        record.update(histogram_stats(hist, 'before'))
+
+        if issue == 'Normal':
+            after_hist = hist
+        else:
+            enhanced = enhance_image(image, issue)
+            after_hist = gray_histogram(enhanced, parallel=False)
+            if output_dir is not None:
+                record['output'] = os.path.join(output_dir, os.path.basename(image_path))
+                if not cv2.imwrite(record['output'], enhanced):
+                    raise OSError(f"Unable to write {record['output']}")
+        record.update(histogram_stats(after_hist, 'after'))
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'error': f"{type(exc).__name__}: {exc}"}
+
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+# Fix every image in a worker pool and write the quality report. Each worker counts its
+# histograms serially, as the processes already keep every core busy.
+def run_batch(inputs, results_path, output_dir=None, workers=None):
+    image_paths = collect_images(inputs)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fix_image, image_paths, repeat(output_dir), chunksize=8))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path, CSV_FIELDS)
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyze and fix the intensity issues of many images.')
+    parser.add_argument('inputs', nargs='+', help='image directories or files')
+    parser.add_argument('--output-dir', default=None, help='save the enhanced images here (normal images are skipped)')
+    parser.add_argument('--results', default='report.csv', help='report file (CSV)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    results, elapsed = run_batch(args.inputs, args.results, args.output_dir, args.workers)
+    issues = {}
+    for result in results:
+        issue = result.get('issue', 'Error')
+        issues[issue] = issues.get(issue, 0) + 1
+    summary = ', '.join(f"{count} {issue}" for issue, count in sorted(issues.items()))
+    print(f"Processed {len(results)} images in {elapsed:.2f}s: {summary}")
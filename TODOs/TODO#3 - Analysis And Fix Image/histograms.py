@@ -0,0 +1,156 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import cv2
+import numpy as np
+
+# calcHist returns its counts as float32, exact only up to 2^24 pixels per bin, so every
+# chunk stays below that many pixels
+MAX_CHUNK_PIXELS = 2 ** 24 - 1
+
+# Images smaller than this are counted in one chunk on the calling thread
+MIN_PARALLEL_PIXELS = 2 ** 20
+
+# Images handed to the threads at a time by build_corpus, so a corpus of millions never has
+# more futures or finished histograms than this waiting
+CORPUS_BATCH = 256
+
+# Threads for the row chunks (calcHist releases the GIL), shared and only started on first
+# use. Scripts that already spread whole images over every core pass parallel=False.
+histogram_threads = os.cpu_count() or 1
+_histogram_pool = None
+_pool_lock = threading.Lock()
+
+
+# The shared histogram threads, started on the first call
+def histogram_pool():
+    global _histogram_pool
+    with _pool_lock:
+        if _histogram_pool is None:
+            _histogram_pool = ThreadPoolExecutor(max_workers=histogram_threads, thread_name_prefix='histogram')
+    return _histogram_pool
+
+
+# Grayscale version of an image for histogram analysis
+def to_gray(image):
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+# Exact 256-bin uint32 histogram of one chunk of rows
+def _chunk_histogram(chunk):
+    return cv2.calcHist([chunk], [0], None, [256], [0, 256]).ravel().astype(np.uint32)
+
+
+# 256-bin uint32 histogram of a grayscale 8-bit image, counted over row chunks in parallel
+# threads and merged. Code already running in the shared threads, or in workers that keep
+# every core busy with whole images, passes parallel=False to count on the calling thread.
+def chunked_histogram(gray, chunk_rows=None, parallel=True):
+    parallel = parallel and histogram_threads > 1
+    if chunk_rows is None:
+        if gray.size < MIN_PARALLEL_PIXELS or not parallel:
+            chunk_rows = gray.shape[0]
+        else:
+            chunk_rows = -(-gray.shape[0] // histogram_threads)
+    chunk_rows = max(1, min(chunk_rows, MAX_CHUNK_PIXELS // max(gray.shape[1], 1)))
+
+    chunks = [gray[row:row + chunk_rows] for row in range(0, gray.shape[0], chunk_rows)]
+    if len(chunks) == 1:
+        return _chunk_histogram(chunks[0])
+    hist = np.zeros(256, dtype=np.uint32)
+    for chunk_hist in (histogram_pool().map if parallel else map)(_chunk_histogram, chunks):
+        hist += chunk_hist
+    return hist
+
+
+class CorpusHistogram:
+    """Aggregate grayscale histogram of any number of images.
+
+    Only the 256 uint64 counts and the image count are kept, so millions of images can be
+    added one at a time. Shards built separately (e.g. on other machines) are saved and
+    merged into the corpus total.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(256, dtype=np.uint64)
+        self.images = 0
+
+    def add(self, hist):
+        """Add the histogram of one image."""
+        self.counts += np.ravel(hist).astype(np.uint64)
+        self.images += 1
+        return self
+
+    def merge(self, other):
+        """Add the totals of another corpus histogram (a shard)."""
+        self.counts += other.counts
+        self.images += other.images
+        return self
+
+    def pixels(self):
+        return int(self.counts.sum())
+
+    def fractions(self):
+        """Share of the corpus pixels at every intensity."""
+        pixels = self.pixels()
+        return self.counts / pixels if pixels else np.zeros(256)
+
+    def save(self, path):
+        np.savez(path, counts=self.counts, images=self.images)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        corpus = cls()
+        corpus.counts, corpus.images = data['counts'].astype(np.uint64), int(data['images'])
+        return corpus
+
+
+# Worker: histogram of one image file, or None if it cannot be read. Only the 1 KB
+# histogram leaves the worker, never the pixels.
+def file_histogram(image_path):
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    return None if gray is None else chunked_histogram(gray, parallel=False)
+
+
+# Add every image to a corpus histogram in the shared threads, batch_size images at a time.
+# The paths may be any iterable, e.g. a generator over millions of files.
+def build_corpus(image_paths, corpus=None, batch_size=CORPUS_BATCH):
+    corpus = CorpusHistogram() if corpus is None else corpus
+    skipped = 0
+    paths = iter(image_paths)
+    batch = list(islice(paths, batch_size))
+    while batch:
+        for hist in histogram_pool().map(file_histogram, batch):
+            if hist is None:
+                skipped += 1
+            else:
+                corpus.add(hist)
+        batch = list(islice(paths, batch_size))
+    return corpus, skipped
+
+
+if __name__ == '__main__':
+    from triage import collect_images
+
+    parser = argparse.ArgumentParser(description='Aggregate grayscale histogram of an image corpus or its shards.')
+    parser.add_argument('inputs', nargs='*', help='image directories or files')
+    parser.add_argument('--merge', nargs='+', default=[], help='saved shard histograms (.npz) to add')
+    parser.add_argument('--output', default='corpus_histogram.npz')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    corpus = CorpusHistogram()
+    for shard_path in args.merge:
+        corpus.merge(CorpusHistogram.load(shard_path))
+    corpus, skipped = build_corpus(collect_images(args.inputs), corpus)
+    corpus.save(args.output)
+
+    mean = (corpus.fractions() * np.arange(256)).sum()
+    print(f"{corpus.images} images ({skipped} unreadable), {corpus.pixels()} pixels, mean intensity {mean:.1f}, "
+          f"saved {args.output} in {time.perf_counter() - start:.2f}s")
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
+from histograms import chunked_histogram, to_gray
 
 def find_image_type(image):
     """Determine if the image is binary, grayscale or RGB."""
@@ -13,33 +14,35 @@ def find_image_type(image):
     else:
         return 'Unknown'
 
-def analyze_histogram(image):
+# Fraction of the pixels each issue looks at, and how much of the image it takes:
+# 90% of pixels too dark, 70% too bright, or 90% concentrated in the middle range
+ISSUE_RULES = [
+    ('Over Dark', (0, 50), 0.9),
+    ('Over Bright', (180, 256), 0.7),
+    ('Low Contrast', (50, 200), 0.9),
+]
+
+def gray_histogram(image, parallel=True):
+    """256-bin uint32 histogram of the image's grayscale intensities (see chunked_histogram)."""
+    # Convert RGB to grayscale for histogram analysis
+    return chunked_histogram(to_gray(image), parallel=parallel)
+
+def issue_fractions(hist):
+    """Fraction of the pixels in the intensity range of each issue, in ISSUE_RULES order."""
+    total_pixels = float(np.sum(hist))
+    return [float(np.sum(hist[low:high])) / total_pixels for _, (low, high), _ in ISSUE_RULES]
+
+def classify_histogram(hist):
+    """Find from a histogram if the image is over dark, over bright, low contrast, or normal."""
+    # The first issue whose range holds more than its share of the pixels wins
+    for (issue, _, threshold), fraction in zip(ISSUE_RULES, issue_fractions(hist)):
+        if fraction > threshold:
+            return issue
+    return 'Normal'
+
+def analyze_histogram(image, parallel=True):
     """Analyze the image histogram to find if it's over dark, over bright, low contrast, or normal."""
-    if len(image.shape) == 3:
-        # Convert RGB to grayscale for histogram analysis
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray_image = image
-
-    # Calculate histogram
-    hist = cv2.calcHist([gray_image], [0], None, [256], [0, 256])
-
-    # Determine if the image is over dark, over bright, or low contrast
-    total_pixels = gray_image.size
-    darkness_threshold = total_pixels * 0.9  # 90% of pixels too dark 
-    brightness_threshold = total_pixels * 0.7  # 70% of pixels too bright 
-    low_contrast_threshold = total_pixels * 0.9  # 90% of pixels concentrated in middle range
-    print(total_pixels)
-    print(brightness_threshold)
-    print(np.sum(hist[190:]))
-    if np.sum(hist[:50]) > darkness_threshold:
-        return 'Over Dark'
-    elif np.sum(hist[180:]) > brightness_threshold:
-        return 'Over Bright'
-    elif np.sum(hist[50:200]) > low_contrast_threshold:
-        return 'Low Contrast'
-    else:
-        return 'Normal'
+    return classify_histogram(gray_histogram(image, parallel))
 
 def enhance_image(image, issue):
     """Enhance the image depending on the detected issue."""
@@ -65,19 +68,12 @@ def enhance_image(image, issue):
     return enhanced_image
 
 
-def display_results(original_image, enhanced_image, image_type, issue):
+def display_results(original_image, enhanced_image, image_type, issue, hist_original=None):
     """Display the original and enhanced images along with their histograms, and show image type and issue on side."""
-    # Convert to grayscale if needed for histogram comparison
-    if len(original_image.shape) == 3:
-        gray_original = cv2.cvtColor(original_image, cv2.COLOR_BGR2GRAY)
-        gray_enhanced = cv2.cvtColor(enhanced_image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray_original = original_image
-        gray_enhanced = enhanced_image
-
-    # Calculate histograms
-    hist_original = cv2.calcHist([gray_original], [0], None, [256], [0, 256])
-    hist_enhanced = cv2.calcHist([gray_enhanced], [0], None, [256], [0, 256])
+    # Histograms of the grayscale images; the original's is passed in when it was already computed
+    if hist_original is None:
+        hist_original = gray_histogram(original_image)
+    hist_enhanced = hist_original if enhanced_image is original_image else gray_histogram(enhanced_image)
 
     # Create figure with space for additional info
     plt.figure(figsize=(14, 8))  # Wider figure to accommodate text on the side
@@ -124,14 +120,16 @@ def process_image(image_path):
     print(f"Image Type: {image_type}")
 
     # Step 2: Analyze histogram and find issues
-    issue = analyze_histogram(image)
+    hist = gray_histogram(image)
+    issue = classify_histogram(hist)
     print(f"Image Issue: {issue}")
 
     # Step 3: Enhance the image if there's an issue
     enhanced_image = enhance_image(image, issue)
 
     # Step 4: Display the results with image type and issue
-    display_results(image, enhanced_image, image_type, issue)
+    display_results(image, enhanced_image, image_type, issue, hist)
 # Test the program on an image
-image_path = 'images/3.png' 
-process_image(image_path)
+if __name__ == '__main__':
+    image_path = 'images/3.png'
+    process_image(image_path)
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from math import ceil, log
+
+import cv2
+import numpy as np
+
+from main import ISSUE_RULES, analyze_histogram, classify_histogram, gray_histogram, issue_fractions
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Grayscale read flags for each reduction factor. JPEGs are scaled by libjpeg while decoding
+# the DCT blocks (at 1/8 only their DC coefficients), so most of the decoding is skipped.
+# Each reduced pixel is the average of a block, though, not a sample of it.
+REDUCED_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Chance that a sampled issue fraction is off by more than the margin
+SAMPLE_FAILURE = 1e-6
+
+CSV_FIELDS = ['image', 'issue', 'exact_fallback', 'seconds', 'exact_issue', 'agree', 'fraction_error',
+              'exact_seconds', 'error']
+
+
+# Image paths of the inputs without repeats: the images of each directory, and files as
+# given (the shell expands glob patterns)
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.normpath(os.path.join(item, name)) for name in os.listdir(item)
+                                if name.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            paths.append(os.path.normpath(item))
+    return list(dict.fromkeys(paths))
+
+
+# Pixels to draw so that each issue fraction of the sample is off by more than `margin` with
+# a chance below SAMPLE_FAILURE: Hoeffding's bound 2 exp(-2 n margin^2), for every fraction.
+# About 3100 pixels for a margin of 0.05, whatever the size of the image.
+def sample_count(margin):
+    return ceil(log(2 * len(ISSUE_RULES) / SAMPLE_FAILURE) / (2 * margin ** 2))
+
+
+# Flat indices of `count` pixels drawn at random (with replacement) among `size`, sorted so
+# the gather walks the image forward. The same draw is reused for every image of that size.
+@lru_cache(maxsize=64)
+def sample_indices(size, count):
+    return np.sort(np.random.default_rng(0).integers(0, size, count))
+
+
+# Histogram of pixels drawn at random, enough for the margin (see sample_count). A regular
+# grid of pixels would alias with halftones and other periodic textures, and an average of
+# blocks (a reduced read) turns fine black and white detail gray. Small images are counted
+# in full.
+def sampled_histogram(image, margin=0.05):
+    size = image.shape[0] * image.shape[1]
+    count = sample_count(margin)
+    if count >= size:
+        return gray_histogram(image)
+    pixels = np.ascontiguousarray(image).reshape((size,) + image.shape[2:])[sample_indices(size, count)]
+    return gray_histogram(pixels.reshape((count, 1) + image.shape[2:]))
+
+
+# Classify an approximate histogram and tell whether that is certain: every fraction the
+# decision depends on is more than `margin` away from its threshold. A sample whose
+# fractions are off by at most `margin` then gives the same issue as the exact histogram.
+def classify_with_margin(hist, margin):
+    for (issue, _, threshold), fraction in zip(ISSUE_RULES, issue_fractions(hist)):
+        if abs(fraction - threshold) <= margin:
+            return classify_histogram(hist), False
+        if fraction > threshold:
+            return issue, True
+    return 'Normal', True
+
+
+# Triage an image in memory from a random sample, falling back to the exact histogram
+# when the sample is too close to a threshold. Returns the issue and whether it fell back.
+def triage_image(image, margin=0.05):
+    issue, certain = classify_with_margin(sampled_histogram(image, margin), margin)
+    if certain:
+        return issue, False
+    return analyze_histogram(image), True
+
+
+# Approximate histogram of an image file, and the image when it was decoded in full (else
+# None). By default the image is decoded and sampled (see sampled_histogram). With
+# reduced_jpeg, JPEGs are read at 1/factor by the decoder instead, which skips most of the
+# decoding but averages blocks: fine textures such as halftones or text come out mid-gray,
+# so the error of their fractions has no bound. Other formats are decoded in full anyway.
+def sample_histogram(image_path, factor=8, margin=0.05, reduced_jpeg=False):
+    if reduced_jpeg and image_path.lower().endswith(('.jpg', '.jpeg')):
+        reduced = cv2.imread(image_path, REDUCED_GRAYSCALE[factor])
+        if reduced is None:
+            raise ValueError('Unable to load image')
+        return gray_histogram(reduced, parallel=False), None
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError('Unable to load image')
+    return sampled_histogram(image, margin), image
+
+
+# Triage an image file from a sample histogram, falling back to the exact one
+def triage_file(image_path, factor=8, margin=0.05, reduced_jpeg=False):
+    hist, image = sample_histogram(image_path, factor, margin, reduced_jpeg)
+    issue, certain = classify_with_margin(hist, margin)
+    if certain:
+        return issue, False
+    return analyze_histogram(cv2.imread(image_path) if image is None else image, parallel=False), True
+
+
+# Worker: triage one image; with check, also run the exact path and compare
+def triage_record(image_path, factor=8, margin=0.05, check=False, reduced_jpeg=False):
+    start = time.perf_counter()
+    try:
+        issue, fallback = triage_file(image_path, factor, margin, reduced_jpeg)
+        record = {'image': image_path, 'issue': issue, 'exact_fallback': fallback,
+                  'seconds': round(time.perf_counter() - start, 5)}
+        if check:
+            start = time.perf_counter()
+            exact_hist = gray_histogram(cv2.imread(image_path), parallel=False)
+            record['exact_issue'] = classify_histogram(exact_hist)
+            record['exact_seconds'] = round(time.perf_counter() - start, 5)
+            record['agree'] = record['exact_issue'] == issue
+            sample_hist, _ = sample_histogram(image_path, factor, margin, reduced_jpeg)
+            record['fraction_error'] = round(max(abs(a - b) for a, b in
+                                                 zip(issue_fractions(sample_hist), issue_fractions(exact_hist))), 5)
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'error': f"{type(exc).__name__}: {exc}"}
+    return record
+
+
+# Write one CSV row per image with the given columns
+def write_results(results, results_path, fields=CSV_FIELDS):
+    with open(results_path, 'w', newline='') as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+# Triage every image in a thread pool (decoding releases the GIL) and write the results.
+# The images are spread over the threads, so each histogram is counted serially.
+def run_triage(inputs, results_path, factor=8, margin=0.05, check=False, workers=None, reduced_jpeg=False):
+    if factor not in REDUCED_GRAYSCALE:
+        raise ValueError(f"Reduction factor must be one of {sorted(REDUCED_GRAYSCALE)}")
+    image_paths = collect_images(inputs)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(triage_record, image_paths, repeat(factor), repeat(margin), repeat(check),
+                                    repeat(reduced_jpeg)))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path)
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fast histogram triage of image quality from sampled pixels.')
+    parser.add_argument('inputs', nargs='+', help='image directories or files')
+    parser.add_argument('--factor', type=int, default=8, choices=sorted(REDUCED_GRAYSCALE),
+                        help='reduction factor of --reduced-jpeg (default: 8)')
+    parser.add_argument('--margin', type=float, default=0.05,
+                        help='use the exact histogram when a fraction is this close to its threshold; '
+                             'the sample is drawn large enough to be off by more only once in a million')
+    parser.add_argument('--check', action='store_true', help='also run the exact path and report the agreement')
+    parser.add_argument('--reduced-jpeg', action='store_true',
+                        help='read JPEGs at 1/factor in the decoder: much faster, but it averages blocks, '
+                             'so halftones and text scans are misread')
+    parser.add_argument('--results', default='triage.csv', help='results file (CSV)')
+    parser.add_argument('--workers', type=int, default=None, help='worker threads (default: CPU count + 4, at most 32)')
+    args = parser.parse_args()
+
+    results, elapsed = run_triage(args.inputs, args.results, args.factor, args.margin, args.check, args.workers,
+                                  args.reduced_jpeg)
+    done = [result for result in results if 'error' not in result]
+    fallbacks = sum(result['exact_fallback'] for result in done)
+    print(f"Triaged {len(results)} images ({len(results) - len(done)} errors) in {elapsed:.2f}s, "
+          f"{fallbacks} fell back to the exact histogram")
+    if args.check and done:
+        agree = sum(result['agree'] for result in done)
+        triage_seconds = sum(result['seconds'] for result in done)
+        exact_seconds = sum(result['exact_seconds'] for result in done)
+        print(f"Agreement with the exact path: {agree}/{len(done)} ({agree / len(done):.2%}), "
+              f"largest fraction error {max(result['fraction_error'] for result in done):.4f}, "
+              f"triage {triage_seconds / len(done) * 1000:.2f} ms vs exact {exact_seconds / len(done) * 1000:.2f} ms per image")
@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+
+from main import HUE_COLOR_TABLE, SAT_VAL_LOWER, SAT_VAL_UPPER, count_traffic_light_pixels, classify_color_counts
+
+
+def build_color_hue_luts():
+    """Precompute, per color, a 256-entry LUT that maps the hue values of that color to 255."""
+    luts = {}
+    for row, color in enumerate(('Red', 'Yellow', 'Green')):
+        lut = np.zeros(256, dtype=np.uint8)
+        lut[:180][HUE_COLOR_TABLE[row] > 0] = 255
+        luts[color] = lut
+    return luts
+
+COLOR_HUE_LUTS = build_color_hue_luts()
+
+
+def find_lamp_region(hsv_frame, color, padding=(0.5, 3.0)):
+    """Return ((x, y, w, h), area) for the largest blob of ``color`` pixels, or (None, 0) if there is none.
+
+    The box is grown on every side by ``padding`` = (x, y) times the blob width and height, so
+    for a vertical light it also covers the other lamps above and below, and clipped to the frame.
+    """
+    sat_val_mask = cv2.inRange(hsv_frame, SAT_VAL_LOWER, SAT_VAL_UPPER)
+    hue = np.ascontiguousarray(hsv_frame[:, :, 0])
+    lamp_mask = cv2.bitwise_and(cv2.LUT(hue, COLOR_HUE_LUTS[color]), sat_val_mask)
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(lamp_mask, connectivity=8)
+    if num_labels < 2:
+        return None, 0
+
+    # Label 0 is the background; keep the largest blob of the winning color
+    largest = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+    x, y, w, h, area = stats[largest]
+    pad_x, pad_y = int(round(w * padding[0])), int(round(h * padding[1]))
+    frame_h, frame_w = hsv_frame.shape[:2]
+    x0, y0 = max(x - pad_x, 0), max(y - pad_y, 0)
+    x1, y1 = min(x + w + pad_x, frame_w), min(y + h + pad_y, frame_h)
+    return (int(x0), int(y0), int(x1 - x0), int(y1 - y0)), int(area)
+
+
+class AdaptiveTrafficLightDetector:
+    """Detect the traffic light color by re-scanning only the lamp region found on an earlier frame.
+
+    - The first frame gets a full-frame scan that also locates the lit lamp region.
+    - Later frames scan only that region. If its vote is 'Unknown', the winning share of the
+      colored pixels drops below ``min_confidence``, or the winning count drops below
+      ``min_lamp_fraction`` of the lamp found by the last full scan, the frame falls back to a
+      full-frame scan that re-locates the lamp.
+    - Frames whose region is unchanged since the last classified frame reuse the last color.
+      The change is measured as the largest absolute difference between ``thumb_size``
+      grayscale thumbnails of the region, so a lamp switching on or off is not averaged away.
+    """
+
+    def __init__(self, min_confidence=0.6, min_lamp_fraction=0.5, diff_threshold=8,
+                 thumb_size=(16, 16), padding=(0.5, 3.0)):
+        self.min_confidence = min_confidence
+        self.min_lamp_fraction = min_lamp_fraction
+        self.diff_threshold = diff_threshold
+        self.thumb_size = thumb_size
+        self.padding = padding
+        self.reset()
+
+    def reset(self):
+        """Forget the lamp region and the last classified frame."""
+        self.roi = None
+        self.lamp_area = 0
+        self.last_thumb = None
+        self.last_color = None
+        self.stats = {'full_scans': 0, 'roi_scans': 0, 'skipped': 0}
+
+    def _crop(self, frame):
+        x, y, w, h = self.roi
+        return frame[y:y + h, x:x + w]
+
+    def _thumbnail(self, region):
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _is_unchanged(self, thumb):
+        return self.last_thumb is not None and np.max(np.abs(thumb - self.last_thumb)) < self.diff_threshold
+
+    def _scan_roi(self, frame):
+        """Classify the lamp region, returning None when the vote is not trustworthy."""
+        counts = count_traffic_light_pixels(cv2.cvtColor(self._crop(frame), cv2.COLOR_BGR2HSV))
+        color = classify_color_counts(*counts)
+        winner, total = max(counts), sum(counts)
+        if color == "Unknown" or winner < self.min_confidence * total or winner < self.min_lamp_fraction * self.lamp_area:
+            return None
+        return color
+
+    def _scan_full(self, frame):
+        """Classify the whole frame and re-locate the lamp region around the winning color."""
+        self.stats['full_scans'] += 1
+        hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        color = classify_color_counts(*count_traffic_light_pixels(hsv_frame))
+        if color == "Unknown":
+            self.roi, self.lamp_area = None, 0
+        else:
+            self.roi, self.lamp_area = find_lamp_region(hsv_frame, color, self.padding)
+        return color
+
+    def detect(self, frame):
+        """Return the color name for this frame, like detect_traffic_light_color."""
+        color, thumb = None, None
+        if self.roi is not None:
+            thumb = self._thumbnail(self._crop(frame))
+            if self._is_unchanged(thumb):
+                self.stats['skipped'] += 1
+                return self.last_color
+            self.stats['roi_scans'] += 1
+            color = self._scan_roi(frame)
+
+        if color is None:
+            color = self._scan_full(frame)
+            thumb = self._thumbnail(self._crop(frame)) if self.roi is not None else None
+
+        self.last_thumb = thumb
+        self.last_color = color
+        return color
+
+    def __call__(self, frame):
+        return self.detect(frame)
@@ -0,0 +1,73 @@
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+
+from main import detect_traffic_light_color
+
+
+def detect_traffic_light_color_inrange(frame):
+    """Original detector: four inRange masks, one bitwise_or and three countNonZero scans."""
+    hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+
+    red_mask1 = cv2.inRange(hsv_frame, np.array([0, 100, 100]), np.array([10, 255, 255]))
+    red_mask2 = cv2.inRange(hsv_frame, np.array([160, 100, 100]), np.array([180, 255, 255]))
+    red_mask = cv2.bitwise_or(red_mask1, red_mask2)
+    yellow_mask = cv2.inRange(hsv_frame, np.array([15, 100, 100]), np.array([35, 255, 255]))
+    green_mask = cv2.inRange(hsv_frame, np.array([35, 100, 100]), np.array([85, 255, 255]))
+
+    red_pixels = cv2.countNonZero(red_mask)
+    yellow_pixels = cv2.countNonZero(yellow_mask)
+    green_pixels = cv2.countNonZero(green_mask)
+
+    if red_pixels > yellow_pixels and red_pixels > green_pixels:
+        return "Red"
+    elif yellow_pixels > red_pixels and yellow_pixels > green_pixels:
+        return "Yellow"
+    elif green_pixels > red_pixels and green_pixels > yellow_pixels:
+        return "Green"
+    else:
+        return "Unknown"
+
+
+def load_frames(video_path, size, limit):
+    """Read up to ``limit`` frames from the video, resized to ``size``."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, size))
+    cap.release()
+    return frames
+
+
+def time_per_frame(detector, frames, repeat):
+    """Best-of-``repeat`` average time per frame in milliseconds."""
+    timings = timeit.repeat(lambda: [detector(frame) for frame in frames], number=1, repeat=repeat)
+    return min(timings) / len(frames) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the traffic light color detectors per 1080p frame.')
+    parser.add_argument('video_path', nargs='?', default='signal.mp4')
+    parser.add_argument('--frames', type=int, default=60, help='frames to time')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Check that both detectors agree on every frame of the video at its native size
+    all_frames = load_frames(args.video_path, (640, 360), limit=10 ** 6)
+    rng = np.random.default_rng(0)
+    all_frames += [rng.integers(0, 256, (360, 640, 3), dtype=np.uint8) for _ in range(20)]
+    mismatches = sum(detect_traffic_light_color(frame) != detect_traffic_light_color_inrange(frame)
+                     for frame in all_frames)
+    print(f"Checked {len(all_frames)} frames, mismatches: {mismatches}")
+
+    frames = load_frames(args.video_path, (1920, 1080), args.frames)
+    before = time_per_frame(detect_traffic_light_color_inrange, frames, args.repeat)
+    after = time_per_frame(detect_traffic_light_color, frames, args.repeat)
+    print(f"inRange/countNonZero: {before:.2f} ms per 1080p frame")
+    print(f"Fused hue histogram:  {after:.2f} ms per 1080p frame")
+    print(f"Speedup: {before / after:.2f}x")
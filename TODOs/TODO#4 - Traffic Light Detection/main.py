@@ -2,37 +2,38 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 
-def detect_traffic_light_color(frame):
-    """Detects the color of the traffic light in the frame and returns the color name."""
-    # Convert the frame to HSV color space
-    hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-    # Define HSV color ranges for red, yellow, and green
-    red_lower1 = np.array([0, 100, 100])
-    red_upper1 = np.array([10, 255, 255])
-    red_lower2 = np.array([160, 100, 100])
-    red_upper2 = np.array([180, 255, 255])
-
-    yellow_lower = np.array([15, 100, 100])
-    yellow_upper = np.array([35, 255, 255])
-
-    green_lower = np.array([35, 100, 100])
-    green_upper = np.array([85, 255, 255])
-
-    # Create masks for red, yellow, and green
-    red_mask1 = cv2.inRange(hsv_frame, red_lower1, red_upper1)
-    red_mask2 = cv2.inRange(hsv_frame, red_lower2, red_upper2)
-    red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-
-    yellow_mask = cv2.inRange(hsv_frame, yellow_lower, yellow_upper)
-    green_mask = cv2.inRange(hsv_frame, green_lower, green_upper)
-
-    # Count the number of pixels for each color
-    red_pixels = cv2.countNonZero(red_mask)
-    yellow_pixels = cv2.countNonZero(yellow_mask)
-    green_pixels = cv2.countNonZero(green_mask)
-
-    # Determine which color has the most pixels
+# HSV hue ranges for red, yellow, and green (inclusive, OpenCV hue is 0-179).
+# Every color uses the same saturation/value bounds of 100-255.
+HUE_RANGES = {
+    'Red': [(0, 10), (160, 180)],
+    'Yellow': [(15, 35)],
+    'Green': [(35, 85)],
+}
+SAT_VAL_LOWER = np.array([0, 100, 100])
+SAT_VAL_UPPER = np.array([180, 255, 255])
+
+def build_hue_color_table():
+    """Precompute a 3x180 table mapping each hue bin to the red, yellow and green counts it adds to."""
+    table = np.zeros((3, 180), dtype=np.float64)
+    for row, color in enumerate(('Red', 'Yellow', 'Green')):
+        for lower, upper in HUE_RANGES[color]:
+            table[row, lower:upper + 1] = 1  # Hue 35 counts for both yellow and green, as with inRange
+    return table
+
+HUE_COLOR_TABLE = build_hue_color_table()
+
+def count_traffic_light_pixels(hsv_frame):
+    """Count the red, yellow and green pixels of an HSV frame in a single pass over the pixels."""
+    # Gate on saturation and value once, since the bounds are shared by all colors
+    sat_val_mask = cv2.inRange(hsv_frame, SAT_VAL_LOWER, SAT_VAL_UPPER)
+
+    # Histogram the hue of the gated pixels, then fold the 180 bins into color counts
+    hue_hist = cv2.calcHist([hsv_frame], [0], sat_val_mask, [180], [0, 180])
+    red_pixels, yellow_pixels, green_pixels = HUE_COLOR_TABLE @ hue_hist.ravel()
+    return int(red_pixels), int(yellow_pixels), int(green_pixels)
+
+def classify_color_counts(red_pixels, yellow_pixels, green_pixels):
+    """Return the color name with strictly the most pixels, or 'Unknown' on a tie."""
     if red_pixels > yellow_pixels and red_pixels > green_pixels:
         return "Red"
     elif yellow_pixels > red_pixels and yellow_pixels > green_pixels:
@@ -42,6 +43,26 @@ def detect_traffic_light_color(frame):
     else:
         return "Unknown"
 
+def detect_traffic_light_color(frame):
+    """Detects the color of the traffic light in the frame and returns the color name."""
+    # Convert the frame to HSV color space
+    hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+
+    # Count the number of pixels for each color
+    red_pixels, yellow_pixels, green_pixels = count_traffic_light_pixels(hsv_frame)
+
+    # Determine which color has the most pixels
+    return classify_color_counts(red_pixels, yellow_pixels, green_pixels)
+
+def annotate_frame(frame, color_detected):
+    """Overlay the detected color name on the frame in place."""
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 1
+    font_color = (0, 0, 0)  # Green text
+    thickness = 2
+    cv2.putText(frame, f'Color: {color_detected}', (10, 30), font, font_scale, font_color, thickness, cv2.LINE_AA)
+    return frame
+
 def process_video_with_matplotlib(video_path):
     """Process the video frame by frame and display the frames using Matplotlib."""
     cap = cv2.VideoCapture(video_path)
@@ -64,11 +85,7 @@ def process_video_with_matplotlib(video_path):
         color_detected = detect_traffic_light_color(frame)
 
         # Overlay the detected color name on the frame
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 1
-        font_color = (0, 0, 0)  # Green text
-        thickness = 2
-        cv2.putText(frame, f'Color: {color_detected}', (10, 30), font, font_scale, font_color, thickness, cv2.LINE_AA)
+        annotate_frame(frame, color_detected)
 
         # Convert the frame from BGR to RGB for Matplotlib
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -87,5 +104,6 @@ def process_video_with_matplotlib(video_path):
     plt.show()
 
 # Test the program on a video
-video_path = 'signal.mp4'  # Replace with your video path
-process_video_with_matplotlib(video_path)
+if __name__ == '__main__':
+    video_path = 'signal.mp4'  # Replace with your video path
+    process_video_with_matplotlib(video_path)
@@ -0,0 +1,186 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from main import detect_traffic_light_color
+from adaptive import AdaptiveTrafficLightDetector
+from streaming import END_OF_STREAM, read_frames, get_until_stopped
+from tracker import TrafficLightStateTracker
+
+# Sentinel that tells the event writer all workers have finished
+END_OF_EVENTS = None
+
+
+def stream_metrics(source, frames, start, depth_sum, max_depth, source_fps):
+    """Build a metrics record for one stream."""
+    elapsed = time.perf_counter() - start
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    return {
+        'type': 'metrics',
+        'stream': source,
+        'time': time.time(),
+        'frames': frames,
+        'fps': round(fps, 2),
+        'source_fps': source_fps,
+        # Above 1.0 the stream is processed faster than it plays back
+        'realtime_factor': round(fps / source_fps, 2) if source_fps else None,
+        'avg_queue_depth': round(depth_sum / frames, 2) if frames else 0.0,
+        'max_queue_depth': max_depth,
+    }
+
+
+def read_stream(cap, frame_queue, stop_event, errors):
+    """Reader thread: run read_frames, and if it fails record the error and stop the worker.
+
+    The END_OF_STREAM sentinel is still queued (unless the queue is full), so the worker does
+    not wait for frames that will never come.
+    """
+    try:
+        read_frames(cap, frame_queue, stop_event)
+    except Exception as exc:  # Re-raised by the worker once it has stopped
+        errors.append(exc)
+        stop_event.set()
+        try:
+            frame_queue.put_nowait(END_OF_STREAM)
+        except queue.Full:
+            pass  # get_until_stopped returns the sentinel anyway once stop_event is set
+
+
+def watch_stream(source, event_queue, adaptive=False, queue_size=32, metrics_interval=250, window=9, min_votes=6):
+    """Worker: classify every frame of one source and push its debounced color changes to ``event_queue``.
+
+    Frames are decoded on a reader thread into a bounded queue. Its depth is sampled before every
+    frame: a queue that stays near ``queue_size`` means the detector is not keeping up with the
+    decoder. Metrics are pushed every ``metrics_interval`` frames and the final metrics are returned.
+    Labels go through a TrafficLightStateTracker (``window``/``min_votes``), so only debounced
+    transitions, with the duration of the state they end, reach the event stream.
+    """
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video source {source}")
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or None
+    frame_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+    reader = threading.Thread(target=read_stream, args=(cap, frame_queue, stop_event, errors), daemon=True)
+    detector = AdaptiveTrafficLightDetector() if adaptive else detect_traffic_light_color
+
+    tracker = TrafficLightStateTracker(window, min_votes)
+    index, timestamp_ms = -1, 0.0
+    frames, depth_sum, max_depth = 0, 0, 0
+    start = time.perf_counter()
+    reader.start()
+    try:
+        while True:
+            depth = frame_queue.qsize()
+            item = get_until_stopped(frame_queue, stop_event)
+            if item is END_OF_STREAM:
+                break
+            index, timestamp_ms, frame = item
+            color_detected = detector(frame)
+
+            # Only debounced state changes (and the initial state) go into the event stream
+            event = tracker.update(color_detected, round(timestamp_ms, 3), index)
+            if event is not None:
+                event_queue.put(dict(event, type='state_change', stream=source, time=time.time()))
+
+            frames += 1
+            depth_sum += depth
+            max_depth = max(max_depth, depth)
+            if frames % metrics_interval == 0:
+                event_queue.put(stream_metrics(source, frames, start, depth_sum, max_depth, source_fps))
+        if errors:
+            raise errors[0]
+        event = tracker.finish(round(timestamp_ms, 3), index)
+        if event is not None:
+            event_queue.put(dict(event, type='state_change', stream=source, time=time.time()))
+    finally:
+        stop_event.set()
+        reader.join()
+        cap.release()
+
+    return stream_metrics(source, frames, start, depth_sum, max_depth, source_fps)
+
+
+def write_events(event_queue, events_path, verbose):
+    """Drain the shared event queue into one JSON Lines file, tagging each record with the queue depth."""
+    with open(events_path, 'w') as events_file:
+        while True:
+            record = event_queue.get()
+            if record is END_OF_EVENTS:
+                break
+            record['event_queue_depth'] = event_queue.qsize()
+            events_file.write(json.dumps(record) + '\n')
+            events_file.flush()
+            if verbose and record['type'] == 'state_change':
+                duration = '' if record['duration_ms'] is None else f" after {record['duration_ms'] / 1000:.1f}s"
+                print(f"[{record['stream']}] frame {record['frame']}: {record['from']} -> {record['to']}{duration}")
+            elif verbose and record['type'] == 'metrics':
+                print(f"[{record['stream']}] {record['frames']} frames, {record['fps']} fps, "
+                      f"queue depth avg {record['avg_queue_depth']} max {record['max_queue_depth']}")
+
+
+def watch_streams(sources, events_path, max_workers=None, adaptive=False, queue_size=32, window=9, min_votes=6,
+                  verbose=True):
+    """Shard the video sources across a process pool and merge their state changes into one event stream.
+
+    Each source is one task, so live streams that never end need one worker each; by default the
+    pool gets one worker per source, up to the CPU count. Returns the final metrics per source.
+    """
+    if max_workers is None:
+        max_workers = min(len(sources), os.cpu_count() or 1)
+
+    manager = multiprocessing.Manager()
+    event_queue = manager.Queue()
+    writer = threading.Thread(target=write_events, args=(event_queue, events_path, verbose))
+    writer.start()
+
+    results = [None] * len(sources)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(watch_stream, source, event_queue, adaptive, queue_size,
+                                       window=window, min_votes=min_votes): i
+                       for i, source in enumerate(sources)}
+            for future in as_completed(futures):
+                i = futures[future]
+                source = sources[i]
+                try:
+                    metrics = future.result()
+                except Exception as exc:  # One bad source should not stop the others
+                    metrics = {'type': 'error', 'stream': source, 'time': time.time(), 'error': str(exc)}
+                event_queue.put(metrics)
+                results[i] = metrics
+    finally:
+        event_queue.put(END_OF_EVENTS)
+        writer.join()
+        manager.shutdown()
+
+    return [metrics for metrics in results if metrics is not None]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch many traffic light videos or streams in parallel.')
+    parser.add_argument('sources', nargs='+', help='video files or stream URIs')
+    parser.add_argument('--events', default='events.jsonl', help='merged event stream (JSON Lines)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per source, up to the CPU count)')
+    parser.add_argument('--queue-size', type=int, default=32, help='frames buffered per stream')
+    parser.add_argument('--adaptive', action='store_true', help='track the lamp region and skip unchanged frames')
+    parser.add_argument('--window', type=int, default=9, help='frames that vote on the light state')
+    parser.add_argument('--min-votes', type=int, default=6, help='votes a new color needs to change the state')
+    args = parser.parse_args()
+
+    for metrics in watch_streams(args.sources, args.events, args.workers, args.adaptive, args.queue_size,
+                                 args.window, args.min_votes):
+        if metrics['type'] == 'error':
+            print(f"{metrics['stream']}: error: {metrics['error']}")
+        else:
+            print(f"{metrics['stream']}: {metrics['frames']} frames at {metrics['fps']} fps "
+                  f"({metrics['realtime_factor']}x real time)")
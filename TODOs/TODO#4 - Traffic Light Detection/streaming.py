@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+from main import detect_traffic_light_color, annotate_frame
+from adaptive import AdaptiveTrafficLightDetector
+
+# Sentinel pushed through the queues to tell the next stage the stream has ended
+END_OF_STREAM = None
+
+
+def put_until_stopped(q, item, stop_event):
+    """Put an item on a bounded queue without blocking forever if another stage failed."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until_stopped(q, stop_event):
+    """Get an item from a queue, returning the end-of-stream sentinel if another stage failed."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return END_OF_STREAM
+
+
+def read_frames(cap, frame_queue, stop_event):
+    """Stage 1: decode frames from the capture and push (index, timestamp_ms, frame)."""
+    index = 0
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break  # Exit the loop when the video ends
+        timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if not put_until_stopped(frame_queue, (index, timestamp_ms, frame), stop_event):
+            return
+        index += 1
+    put_until_stopped(frame_queue, END_OF_STREAM, stop_event)
+
+
+def classify_frames(frame_queue, result_queue, stop_event, detector=detect_traffic_light_color):
+    """Stage 2: run the detector (detect_traffic_light_color by default) on every decoded frame."""
+    while True:
+        item = get_until_stopped(frame_queue, stop_event)
+        if item is END_OF_STREAM:
+            break
+        index, timestamp_ms, frame = item
+        color_detected = detector(frame)
+        if not put_until_stopped(result_queue, (index, timestamp_ms, color_detected, frame), stop_event):
+            return
+    put_until_stopped(result_queue, END_OF_STREAM, stop_event)
+
+
+def open_results_writer(results_file, results_path):
+    """Return a function that writes one per-frame record, as CSV or JSON Lines depending on the extension."""
+    if results_path.lower().endswith('.csv'):
+        writer = csv.writer(results_file)
+        writer.writerow(['frame', 'timestamp_ms', 'color'])
+        return lambda record: writer.writerow([record['frame'], record['timestamp_ms'], record['color']])
+    return lambda record: results_file.write(json.dumps(record) + '\n')
+
+
+def write_outputs(result_queue, results_path, output_video_path, fps, stop_event, summary):
+    """Stage 3: write per-frame results and, optionally, the annotated video."""
+    video_writer = None
+    try:
+        with open(results_path, 'w', newline='') as results_file:
+            write_record = open_results_writer(results_file, results_path)
+            while True:
+                item = get_until_stopped(result_queue, stop_event)
+                if item is END_OF_STREAM:
+                    break
+                index, timestamp_ms, color_detected, frame = item
+                write_record({'frame': index, 'timestamp_ms': round(timestamp_ms, 3), 'color': color_detected})
+
+                if output_video_path is not None:
+                    if video_writer is None:
+                        height, width = frame.shape[:2]
+                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                        video_writer = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+                    video_writer.write(annotate_frame(frame, color_detected))
+
+                summary['frames'] += 1
+                summary['colors'][color_detected] = summary['colors'].get(color_detected, 0) + 1
+    finally:
+        if video_writer is not None:
+            video_writer.release()
+
+
+def process_video_headless(video_path, results_path, output_video_path=None, queue_size=32, adaptive=False):
+    """Process the video without a display, decoding, classifying and writing on separate threads.
+
+    The three stages are connected by bounded queues of ``queue_size`` frames so a slow
+    writer applies back-pressure to the decoder instead of buffering the whole video.
+    With ``adaptive`` the frames are classified by an AdaptiveTrafficLightDetector, which
+    re-scans only the lamp region and skips frames where that region has not changed.
+    Returns a summary dict with the frame count, color counts and throughput.
+    """
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        print("Error: Unable to open video.")
+        return None
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    detector = AdaptiveTrafficLightDetector() if adaptive else detect_traffic_light_color
+    summary = {'frames': 0, 'colors': {}}
+    errors = []
+
+    def run_stage(target, *args):
+        try:
+            target(*args)
+        except Exception as exc:  # Stop the other stages and re-raise in the caller
+            errors.append(exc)
+            stop_event.set()
+
+    stages = [
+        threading.Thread(target=run_stage, args=(read_frames, cap, frame_queue, stop_event), name='decode'),
+        threading.Thread(target=run_stage, args=(classify_frames, frame_queue, result_queue, stop_event, detector),
+                         name='classify'),
+        threading.Thread(target=run_stage, args=(write_outputs, result_queue, results_path, output_video_path,
+                                                 fps, stop_event, summary), name='write'),
+    ]
+
+    start = time.perf_counter()
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+    elapsed = time.perf_counter() - start
+    cap.release()
+
+    if errors:
+        raise errors[0]
+
+    summary['seconds'] = elapsed
+    summary['fps'] = summary['frames'] / elapsed if elapsed > 0 else 0.0
+    if adaptive:
+        summary['detector'] = dict(detector.stats)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless traffic light color detection.')
+    parser.add_argument('video_path', nargs='?', default='signal.mp4', help='video file or stream URI')
+    parser.add_argument('--results', default='results.csv', help='per-frame results (.csv or .jsonl)')
+    parser.add_argument('--output-video', default=None, help='optional annotated output video (.mp4)')
+    parser.add_argument('--queue-size', type=int, default=32, help='frames buffered between stages')
+    parser.add_argument('--adaptive', action='store_true', help='track the lamp region and skip unchanged frames')
+    args = parser.parse_args()
+
+    summary = process_video_headless(args.video_path, args.results, args.output_video, args.queue_size,
+                                     args.adaptive)
+    if summary is not None:
+        print(f"Processed {summary['frames']} frames in {summary['seconds']:.2f}s ({summary['fps']:.1f} fps)")
+        print(f"Color counts: {summary['colors']}")
+        if 'detector' in summary:
+            print(f"Adaptive detector: {summary['detector']}")
@@ -0,0 +1,50 @@
+from collections import Counter, deque
+
+
+class TrafficLightStateTracker:
+    """Debounce per-frame color labels into traffic light state transitions.
+
+    The last ``window`` labels vote on the state. The state only changes once another color
+    holds at least ``min_votes`` of them, so a single noisy frame never flips it and the
+    state does not flicker between two colors with close counts (hysteresis).
+    Every transition reports how long the previous state lasted.
+    """
+
+    def __init__(self, window=9, min_votes=6):
+        if not window // 2 < min_votes <= window:
+            raise ValueError("min_votes must be a strict majority of the window")
+        self.votes = deque(maxlen=window)
+        self.min_votes = min_votes
+        self.state = None
+        self.state_start_ms = None
+        self.state_start_frame = None
+
+    def update(self, color, timestamp_ms, frame=None):
+        """Add one frame's label and return a transition event dict, or None if the state holds."""
+        self.votes.append((color, timestamp_ms, frame))
+        candidate, count = Counter(vote[0] for vote in self.votes).most_common(1)[0]
+        if candidate == self.state or count < self.min_votes:
+            return None
+
+        # Date the new state from its first vote in the window rather than the frame that confirmed it
+        _, start_ms, start_frame = next(vote for vote in self.votes if vote[0] == candidate)
+        return self._transition(candidate, start_ms, start_frame)
+
+    def finish(self, timestamp_ms, frame=None):
+        """Close the current state at the end of the stream and return its final event, or None."""
+        if self.state is None:
+            return None
+        return self._transition(None, timestamp_ms, frame)
+
+    def _transition(self, new_state, start_ms, start_frame):
+        event = {
+            'from': self.state,
+            'to': new_state,
+            'frame': start_frame,
+            'timestamp_ms': start_ms,
+            'duration_ms': None if self.state is None else round(start_ms - self.state_start_ms, 3),
+        }
+        self.state = new_state
+        self.state_start_ms = start_ms
+        self.state_start_frame = start_frame
+        return event
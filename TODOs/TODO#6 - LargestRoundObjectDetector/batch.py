@@ -0,0 +1,152 @@
+import argparse
+import csv
+import importlib.util
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import cv2
+import numpy as np
+
+from main import detect_round_objects, render_overlay
+from pyramid import detect_round_objects_pyramid
+from round_objects import OBJECT_DTYPE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+RESULT_FORMATS = ('.csv', '.npz', '.parquet')
+
+# One record per object of the batch: the index of its image, its measurements and whether
+# it is the largest round object of that image
+RECORD_DTYPE = np.dtype([('image', np.int32)] + OBJECT_DTYPE.descr + [('largest_round', bool)])
+
+CSV_FIELDS = ['image'] + list(OBJECT_DTYPE.names) + ['largest_round', 'error']
+
+
+# Image paths of the inputs without repeats: the images of each directory, and files as
+# given (the shell expands glob patterns)
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.normpath(os.path.join(item, name)) for name in os.listdir(item)
+                                if name.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            paths.append(os.path.normpath(item))
+    return list(dict.fromkeys(paths))
+
+
+# Worker: detect the round objects of one image and, only once they are measured, save the
+# overlay if asked to. Returns the image's result with its object table. With pyramid_levels
+# the coarse-to-fine mode is used and the table only holds the objects it refined.
+def detect_image(image_path, threshold=128, min_size=30, overlay_dir=None, pyramid_levels=None):
+    start = time.perf_counter()
+    image = cv2.imread(image_path)
+    if image is None:
+        return {'image': image_path, 'error': 'Unable to load image'}
+
+    try:
+        if pyramid_levels is None:
+            objects, labels, largest = detect_round_objects(image, threshold, min_size)
+        else:
+            labels = None
+            objects, largest = detect_round_objects_pyramid(image, pyramid_levels, threshold=threshold,
+                                                            min_size=min_size)
+        seconds = time.perf_counter() - start
+        if overlay_dir is not None:
+            # Keep the extension in the name so a.jpg and a.png do not overwrite each other
+            name = os.path.basename(image_path).replace('.', '_')
+            cv2.imwrite(os.path.join(overlay_dir, f"{name}_overlay.png"), render_overlay(image, objects, labels, largest))
+    except Exception as exc:  # Report the failure and keep the batch going
+        return {'image': image_path, 'error': f"{type(exc).__name__}: {exc}"}
+
+    return {'image': image_path, 'objects': objects, 'largest': largest, 'seconds': seconds}
+
+
+# Object records of all images in one array (RECORD_DTYPE), in image order
+def object_records(results):
+    tables = []
+    for index, result in enumerate(results):
+        if 'error' in result:
+            continue
+        objects = result['objects']
+        table = np.zeros(len(objects), dtype=RECORD_DTYPE)
+        for name in OBJECT_DTYPE.names:
+            table[name] = objects[name]
+        table['image'] = index
+        if result['largest'] is not None:
+            table['largest_round'][result['largest']] = True
+        tables.append(table)
+    return np.concatenate(tables) if tables else np.zeros(0, dtype=RECORD_DTYPE)
+
+
+# Write the object records: CSV (one row per object, plus one per failed image), NumPy .npz
+# (the records, the image paths they index and the errors) or Parquet (needs pandas)
+def write_results(results, results_path):
+    records = object_records(results)
+    image_paths = np.array([result['image'] for result in results])
+    errors = [(result['image'], result['error']) for result in results if 'error' in result]
+    extension = os.path.splitext(results_path)[1].lower()
+
+    if extension == '.npz':
+        np.savez(results_path, objects=records, images=image_paths, errors=np.array(errors, dtype=str).reshape(-1, 2))
+    elif extension == '.parquet':
+        import pandas as pd
+        table = pd.DataFrame(records)
+        table['image'] = image_paths[records['image']] if len(records) else []
+        table.to_parquet(results_path, index=False)
+    else:
+        with open(results_path, 'w', newline='') as results_file:
+            writer = csv.DictWriter(results_file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for record in records:
+                row = dict(zip(RECORD_DTYPE.names, record.tolist()))
+                row['image'] = image_paths[record['image']]
+                writer.writerow(row)
+            writer.writerows({'image': image_path, 'error': error} for image_path, error in errors)
+
+
+# Detect the round objects of every image in a worker pool and write the object records
+def run_batch(inputs, results_path, threshold=128, min_size=30, overlay_dir=None, workers=None,
+              pyramid_levels=None):
+    if not results_path.lower().endswith(RESULT_FORMATS):
+        raise ValueError(f"Results file must end with one of {', '.join(RESULT_FORMATS)}")
+    # Fail before starting the workers when pandas is missing
+    if results_path.lower().endswith('.parquet') and importlib.util.find_spec('pandas') is None:
+        raise ImportError('Parquet results need pandas')
+
+    image_paths = collect_images(inputs)
+    if overlay_dir is not None:
+        os.makedirs(overlay_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(detect_image, image_paths, repeat(threshold), repeat(min_size),
+                                    repeat(overlay_dir), repeat(pyramid_levels), chunksize=4))
+    elapsed = time.perf_counter() - start
+
+    write_results(results, results_path)
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the largest round object of every image.')
+    parser.add_argument('inputs', nargs='+', help='image directories or files')
+    parser.add_argument('--threshold', type=int, default=128, help='binary threshold (default: 128)')
+    parser.add_argument('--min-size', type=int, default=30, help='remove objects smaller than this (default: 30)')
+    parser.add_argument('--overlay-dir', default=None, help='save <name>_<ext>_overlay.png here')
+    parser.add_argument('--results', default='objects.csv', help='object records (.csv, .npz or .parquet)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--pyramid', type=int, default=None, metavar='LEVELS',
+                        help='coarse-to-fine mode for very large, sparse images: label the objects LEVELS pyramid '
+                             'levels down and measure at full resolution only those that may be the largest round one')
+    args = parser.parse_args()
+
+    results, elapsed = run_batch(args.inputs, args.results, args.threshold, args.min_size, args.overlay_dir,
+                                 args.workers, args.pyramid)
+    errors = sum('error' in result for result in results)
+    found = sum(result.get('largest') is not None for result in results)
+    objects = sum(len(result['objects']) for result in results if 'error' not in result)
+    print(f"Measured {objects} objects in {len(results)} images ({errors} errors) in {elapsed:.2f}s, "
+          f"{found} images have a round object")
@@ -0,0 +1,82 @@
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+from skimage import measure, morphology
+
+from fused_preprocess import FusedPreprocessor
+from round_objects import measure_objects, largest_round_object
+
+
+# Original chain: threshold, remove_small_objects through a bool copy, two closings, label
+def chain_before(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY)
+    binary_cleaned = morphology.remove_small_objects(binary.astype(bool), min_size=30)
+    binary_cleaned = binary_cleaned.astype(np.uint8) * 255
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
+    closed = cv2.morphologyEx(binary_cleaned, cv2.MORPH_CLOSE, kernel)
+    filled = cv2.morphologyEx(closed, cv2.MORPH_CLOSE, kernel)
+    return filled, measure.label(filled)
+
+
+# Fused chain: one labeling for the size filter, two closings, hole filling and the labeling
+# of measure_objects, in reused buffers
+def chain_after(image, preprocessor):
+    filled = preprocessor.run(image)
+    _, labels, _, _ = cv2.connectedComponentsWithStats(filled, connectivity=8, ltype=cv2.CV_32S)
+    return filled, labels
+
+
+# Synthetic test image: many small filled and hollow discs, as white on black
+def synthetic_image(size, count, seed=0):
+    rng = np.random.default_rng(seed)
+    image = np.zeros((size, size, 3), dtype=np.uint8)
+    for x, y, radius, hollow in zip(rng.integers(0, size, count), rng.integers(0, size, count),
+                                    rng.integers(2, 15, count), rng.random(count) < 0.3):
+        cv2.circle(image, (int(x), int(y)), int(radius), (255, 255, 255), 1 if hollow else -1)
+    return image
+
+
+# Largest round object of a mask, as "area @ (x, y)"
+def describe_largest(mask):
+    objects, _ = measure_objects(mask)
+    index = largest_round_object(objects)
+    if index is None:
+        return 'none'
+    return f"{objects.area[index]} @ ({objects.cx[index]:.0f}, {objects.cy[index]:.0f})"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the fused preprocessing against the original chain.')
+    parser.add_argument('images', nargs='*', default=['input.png'])
+    parser.add_argument('--synthetic', type=int, default=4000, help='also time a synthetic image of this size (0: off)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [(path, cv2.imread(path)) for path in args.images]
+    if args.synthetic:
+        cases.append((f"synthetic {args.synthetic}px", synthetic_image(args.synthetic, args.synthetic * 8)))
+
+    preprocessor = FusedPreprocessor()
+    for name, image in cases:
+        if image is None:
+            print(f"{name}: unable to load image")
+            continue
+
+        before, _ = chain_before(image)
+        after = preprocessor.run(image).copy()
+        # Before hole filling the fused mask matches the original chain, except for objects of
+        # exactly 30 pixels, which newer scikit-image versions also remove; the filled holes are
+        # the only intended change
+        same_closed = np.array_equal(before, preprocessor.run(image, fill_holes=False))
+        changed = np.count_nonzero(before != after) / before.size * 100
+
+        t_before = min(timeit.repeat(lambda: chain_before(image), number=args.number, repeat=args.repeat))
+        t_after = min(timeit.repeat(lambda: chain_after(image, preprocessor), number=args.number, repeat=args.repeat))
+        t_before, t_after = t_before / args.number * 1000, t_after / args.number * 1000
+        print(f"{name:24s} {image.shape[1]}x{image.shape[0]:<5d} before {t_before:8.2f} ms  after {t_after:8.2f} ms  "
+              f"speedup {t_before / t_after:5.2f}x  closed identical {same_closed}  filled {changed:.3f}%  "
+              f"largest round before {describe_largest(before)}, after {describe_largest(after)}")
@@ -1,72 +1,80 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
-from skimage import measure, morphology
-from skimage.measure import regionprops
+from fused_preprocess import FusedPreprocessor
+from round_objects import ROUND_CIRCULARITY, measure_objects, largest_round_object
 
-# Step 1: Read the image
-image = cv2.imread('input.png')
 
-# Convert the image to grayscale
-gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+# Reused between calls, so images of the same size share its buffers
+preprocessor = FusedPreprocessor()
 
-# Step 2: Convert to binary image
-_, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY)
 
+# Steps 2-5: Binary mask of the objects in a BGR image, see fused_preprocess.py:
+# Step 2: Convert the grayscale image to binary
 # Step 3: Remove small objects (area < 30 pixels)
-binary_cleaned = morphology.remove_small_objects(binary.astype(bool), min_size=30)
-binary_cleaned = binary_cleaned.astype(np.uint8) * 255  # Convert to uint8 image
-
 # Step 4: Perform morphological closing with a disk structuring element
-kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
-closed = cv2.morphologyEx(binary_cleaned, cv2.MORPH_CLOSE, kernel)
-
 # Step 5: Fill the holes in binary image
-filled = cv2.morphologyEx(closed, cv2.MORPH_CLOSE, kernel)
-
-# Step 6: Label connected components
-label_image = measure.label(filled)
-
-# Step 7: Measure properties of each region (area, perimeter, circularity)
-props = regionprops(label_image)
-
-# Initialize variables for storing the largest round object
-max_area = 0
-largest_round_object = None
-
-# Display the original image
-plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-plt.title('Round Objects with Circularity')
-plt.axis('off')
-
-# Step 8: Loop through each region to calculate and display circularity for each object
-for prop in props:
-    area = prop.area
-    perimeter = prop.perimeter
-    circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0
-
-    # Mark the centroid of the object
-    centroid = prop.centroid
-    plt.plot(centroid[1], centroid[0], 'ro', markersize=5)  # Mark the centroid
-
-    # Display the circularity value next to each object
-    plt.text(centroid[1], centroid[0] + 25, f'{circularity:.2f}', color='yellow', fontsize=10, fontweight='bold')
-
-    # Check if the object is round based on circularity
-    if circularity > 0.9:
-        # Find the largest round object
-        if area > max_area:
-            max_area = area
-            largest_round_object = prop
-
-# Step 9: Highlight the largest round object if found
-if largest_round_object:
-    largest_centroid = largest_round_object.centroid
-    plt.plot(largest_centroid[1], largest_centroid[0], 'go', markersize=15)  # Highlight the largest round object in green
-    circularity = (4 * np.pi * max_area) / (largest_round_object.perimeter ** 2)
-    print(f'Largest round object found with area = {max_area}, circularity = {circularity:.2f}')
-else:
-    print('No round object found')
-
-# Show the final image with circularity values for all objects
-plt.show()
+# The mask is overwritten by the next call.
+def preprocess(image, threshold=128, min_size=30):
+    return preprocessor.run(image, threshold, min_size)
+
+
+# Steps 6-7: Label the objects, measure all of them at once (area, perimeter, centroid and
+# circularity, see round_objects.py) and find the largest one with a circularity above 0.9
+def detect_round_objects(image, threshold=128, min_size=30):
+    objects, label_image = measure_objects(preprocess(image, threshold, min_size))
+    return objects, label_image, largest_round_object(objects)
+
+
+# Steps 8-9: Draw the objects on a copy of the image with whole-image OpenCV operations: the
+# outlines of all objects are colored through a table indexed by label (green round, red
+# otherwise), all centroids are dotted at once and grown by one dilation, and the largest
+# round object is circled in blue. Only the circularity values of the max_text largest
+# objects are written. Without a label image (coarse-to-fine mode) the outlines are left out.
+def render_overlay(image, objects, labels=None, largest=None, max_text=200):
+    overlay = image.copy()
+    colors = np.zeros((len(objects) + 1, 3), dtype=np.uint8)
+    colors[1:] = np.where((objects.circularity > ROUND_CIRCULARITY)[:, None], (0, 255, 0), (0, 0, 255))
+
+    if labels is not None:
+        foreground = (labels > 0).view(np.uint8)
+        outline = cv2.subtract(foreground, cv2.erode(foreground, np.ones((3, 3), np.uint8))).view(bool)
+        overlay[outline] = colors[labels[outline]]
+
+    height, width = image.shape[:2]
+    centroids = np.zeros((height, width), dtype=np.uint8)
+    centroids[np.clip(np.rint(objects.cy).astype(int), 0, height - 1),
+              np.clip(np.rint(objects.cx).astype(int), 0, width - 1)] = 255
+    centroids = cv2.dilate(centroids, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))).view(bool)
+    overlay[centroids] = (0, 255, 255)
+
+    for obj in objects[np.argsort(-objects.area, kind='stable')[:max_text]]:
+        cv2.putText(overlay, f'{obj.circularity:.2f}', (int(obj.cx), int(obj.cy) + 25),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1, cv2.LINE_AA)
+    if largest is not None:
+        obj = objects[largest]
+        cv2.circle(overlay, (int(round(obj.cx)), int(round(obj.cy))), int(max(obj.w, obj.h)) // 2 + 6, (255, 0, 0), 2)
+    return overlay
+
+
+if __name__ == '__main__':
+    # Step 1: Read the image
+    image = cv2.imread('input.png')
+
+    objects, label_image, largest = detect_round_objects(image)
+
+    # Steps 8-9: Draw every object (circularity next to its centroid) and the largest round
+    # object in one overlay, then display it
+    plt.imshow(cv2.cvtColor(render_overlay(image, objects, label_image, largest), cv2.COLOR_BGR2RGB))
+    plt.title('Round Objects with Circularity')
+    plt.axis('off')
+
+    if largest is not None:
+        largest_object = objects[largest]
+        print(f'Largest round object found with area = {largest_object.area}, '
+              f'circularity = {largest_object.circularity:.2f}')
+    else:
+        print('No round object found')
+
+    # Show the final image with circularity values for all objects
+    plt.show()
@@ -0,0 +1,138 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from fused_preprocess import FusedPreprocessor
+from main import detect_round_objects
+from round_objects import OBJECT_DTYPE, ROUND_CIRCULARITY, largest_round_object, measure_objects
+
+# When refining every coarse object would cost more than this share of the full resolution
+# path, that path runs instead, without refining anything. A crop pixel costs about twice a
+# pixel of the full path (measured on a dense 4000x4000 image), so 0.5 keeps the worst
+# case, where the early stop never comes, no slower than the full path.
+MAX_REFINED_SHARE = 0.5
+
+# Fixed cost of measuring one crop, about 120 us, counted in pixels of the full path (23 ns)
+CROP_COST_PIXELS = 5000
+
+# Buffers for the crops, whose shapes change between calls
+crop_preprocessor = FusedPreprocessor()
+
+ONE_BLOCK = np.ones((3, 3), np.uint8)
+
+
+# Objects of the image reduced by `scale`, each covering every full resolution object that
+# may have pixels in it. A block is set when any of its pixels is above the threshold, then
+# grown by one block to cover what the closings add, and holes are filled like at full
+# resolution. Each full resolution object then lies in the blocks of a single coarse object,
+# even when touching objects merge into one blob at this level. Returns the coarse label
+# image and its connectedComponentsWithStats stats.
+def coarse_objects(gray, scale, threshold):
+    height, width = gray.shape
+    _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+    binary = cv2.copyMakeBorder(binary, 0, -height % scale, 0, -width % scale, cv2.BORDER_CONSTANT, value=0)
+    # Block maximum: each row takes the maximum of the `scale` rows from it down and every
+    # scale-th row is kept, then the same along the columns of the reduced image
+    rows = cv2.dilate(binary, np.ones((scale, 1), np.uint8), anchor=(0, 0))[::scale]
+    blocks = cv2.dilate(rows, np.ones((1, scale), np.uint8), anchor=(0, 0))[:, ::scale]
+    mask = cv2.dilate(blocks, ONE_BLOCK)
+
+    padded = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    cv2.floodFill(padded, None, (0, 0), 128, flags=4)
+    filled = cv2.compare(padded[1:-1, 1:-1], 128, cv2.CMP_NE)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8, ltype=cv2.CV_32S)
+    return labels, stats
+
+
+# Measure the full resolution objects of one coarse object in the crop of its box. Only the
+# objects whose pixels fall in its blocks are kept; the crop holds everything that shapes
+# them. Returns their records in image coordinates and the raster index of their first
+# pixel, which orders them like the labels of the full resolution path.
+def refine_coarse_object(gray, coarse_labels, stats, label, scale, threshold, min_size):
+    height, width = gray.shape
+    x0, y0 = stats[label, cv2.CC_STAT_LEFT] * scale, stats[label, cv2.CC_STAT_TOP] * scale
+    x1 = min((stats[label, cv2.CC_STAT_LEFT] + stats[label, cv2.CC_STAT_WIDTH]) * scale, width)
+    y1 = min((stats[label, cv2.CC_STAT_TOP] + stats[label, cv2.CC_STAT_HEIGHT]) * scale, height)
+    objects, labels = measure_objects(crop_preprocessor.run(gray[y0:y1, x0:x1], threshold, min_size))
+
+    _, first = np.unique(labels.ravel(), return_index=True)
+    first = first[1:]  # Skip the background
+    first_y, first_x = first // (x1 - x0) + y0, first % (x1 - x0) + x0
+    keep = coarse_labels[first_y // scale, first_x // scale] == label
+
+    objects = objects[keep].copy()
+    objects.label = 0
+    objects.x += x0
+    objects.y += y0
+    objects.cx += x0
+    objects.cy += y0
+    return objects, first_y[keep].astype(np.int64) * width + first_x[keep]
+
+
+# Coarse-to-fine detection: label the image `levels` pyramid levels down, then measure the
+# coarse objects at full resolution in decreasing order of their area bound (their blocks),
+# stopping once the bound is below the largest round object found: no object left can be
+# larger. Every coarse object is a candidate whatever its coarse circularity, since round
+# objects that touch their neighbors merge into blobs that do not look round when reduced.
+# Dense images, where the crops would cover much of the image, take the full resolution path.
+# Returns the refined objects (a record array like measure_objects', or all objects after the
+# full resolution path) and the index of the largest round one, or None.
+def detect_round_objects_pyramid(image, levels=2, threshold=128, min_size=30, max_refined_share=MAX_REFINED_SHARE):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    scale = 2 ** levels
+
+    coarse_labels, stats = coarse_objects(gray, scale, threshold)
+    crop_cost = (stats[1:, cv2.CC_STAT_WIDTH].astype(np.int64) * stats[1:, cv2.CC_STAT_HEIGHT] * scale ** 2
+                 + CROP_COST_PIXELS)
+    if crop_cost.sum() > max_refined_share * gray.size:
+        objects, _, largest = detect_round_objects(gray, threshold, min_size)
+        return objects, largest
+
+    bounds = stats[:, cv2.CC_STAT_AREA].astype(np.int64) * scale ** 2
+    refined, order = [], []
+    best_area = 0
+    for label in np.argsort(-bounds[1:], kind='stable') + 1:
+        if bounds[label] < best_area:
+            break
+        objects, first = refine_coarse_object(gray, coarse_labels, stats, label, scale, threshold, min_size)
+        refined.append(objects)
+        order.append(first)
+        round_areas = objects.area[objects.circularity > ROUND_CIRCULARITY]
+        if len(round_areas):
+            best_area = max(best_area, int(round_areas.max()))
+
+    if not refined:
+        return np.zeros(0, dtype=OBJECT_DTYPE).view(np.recarray), None
+    objects = np.concatenate(refined)[np.argsort(np.concatenate(order), kind='stable')].view(np.recarray)
+    return objects, largest_round_object(objects)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the coarse-to-fine detection with the full-resolution one.')
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--levels', type=int, default=2, help='pyramid levels to go down (default: 2, 1/4 size)')
+    args = parser.parse_args()
+
+    for path in args.images:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"{path}: unable to load image")
+            continue
+
+        start = time.perf_counter()
+        objects, _, largest = detect_round_objects(image)
+        full_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        refined, refined_largest = detect_round_objects_pyramid(image, args.levels)
+        pyramid_seconds = time.perf_counter() - start
+
+        full = None if largest is None else objects[largest]
+        coarse = None if refined_largest is None else refined[refined_largest]
+        same = (full is None and coarse is None) or (full is not None and coarse is not None and
+                                                     (full.x, full.y, full.area) == (coarse.x, coarse.y, coarse.area))
+        describe = lambda obj: 'none' if obj is None else f"{obj.area} @ ({obj.cx:.0f}, {obj.cy:.0f})"
+        print(f"{path}: full {full_seconds * 1000:.1f} ms, {len(objects)} objects, largest round {describe(full)}  |  "
+              f"pyramid {pyramid_seconds * 1000:.1f} ms, {len(refined)} refined, largest round {describe(coarse)}  |  "
+              f"same {same}")
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+import pytest
+
+from main import detect_round_objects
+from pyramid import detect_round_objects_pyramid
+
+MEASURED = ['x', 'y', 'w', 'h', 'area', 'perimeter']
+
+
+# Random scene of filled and hollow discs, rectangles and ellipses over noise; many of them
+# touch, so round objects merge with their neighbors at the coarse levels
+def random_scene(seed, size=800):
+    rng = np.random.default_rng(seed)
+    image = np.zeros((size, size, 3), dtype=np.uint8)
+    for _ in range(rng.integers(5, 120)):
+        x, y = (int(value) for value in rng.integers(0, size, 2))
+        radius, other = (int(value) for value in rng.integers(3, 60, 2))
+        color = (int(rng.integers(130, 256)),) * 3
+        shape = rng.integers(0, 4)
+        if shape == 0:
+            cv2.circle(image, (x, y), radius, color, -1)
+        elif shape == 1:
+            cv2.circle(image, (x, y), radius, color, int(rng.integers(1, 4)))
+        elif shape == 2:
+            cv2.rectangle(image, (x, y), (x + radius, y + other), color, -1)
+        else:
+            cv2.ellipse(image, (x, y), (radius, other), float(rng.integers(0, 180)), 0, 360, color, -1)
+    noise = rng.integers(0, 40, (size, size), dtype=np.uint8)
+    return cv2.add(image, cv2.merge([noise] * 3))
+
+
+# Position and area of the largest round object, or None
+def largest_key(objects, largest):
+    if largest is None:
+        return None
+    return int(objects.x[largest]), int(objects.y[largest]), int(objects.area[largest])
+
+
+@pytest.mark.parametrize('seed', range(40))
+@pytest.mark.parametrize('levels', [1, 2, 3])
+def test_pyramid_matches_full_resolution(seed, levels):
+    image = random_scene(seed)
+    objects, _, largest = detect_round_objects(image)
+
+    # Without the dense image shortcut, so the coarse-to-fine path itself is checked
+    refined, refined_largest = detect_round_objects_pyramid(image, levels, max_refined_share=np.inf)
+    assert largest_key(refined, refined_largest) == largest_key(objects, largest)
+
+    # Every refined object is measured like the full resolution path does; the centroids are
+    # computed in the crop, so they may differ in the last bits
+    full = {record: index for index, record in enumerate(objects[MEASURED].tolist())}
+    matches = [full.get(record) for record in refined[MEASURED].tolist()]
+    assert None not in matches
+    np.testing.assert_allclose(refined.cx, objects.cx[matches], atol=1e-9)
+    np.testing.assert_allclose(refined.cy, objects.cy[matches], atol=1e-9)
+
+    refined, refined_largest = detect_round_objects_pyramid(image, levels)
+    assert largest_key(refined, refined_largest) == largest_key(objects, largest)